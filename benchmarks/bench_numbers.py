@@ -0,0 +1,47 @@
+"""
+Micro-benchmark of converting cell values to numbers. Prints the time
+taken per cell by :func:`htmltab.utils.numberise` and by the function
+returned by :func:`htmltab.utils.number_parser`, for columns of numbers,
+text, and repeated categorical values.
+
+    $ python benchmarks/bench_numbers.py
+"""
+
+import contextlib
+import timeit
+
+from htmltab.extract import DEFAULT_CURRENCY_SYMBOLS
+from htmltab.utils import number_parser, numberise
+
+NUM_CELLS = 10_000
+
+COLUMNS = {
+    "numbers": [f"{i * 1.5:,.2f}" for i in range(NUM_CELLS)],
+    "text": [f"name {i}" for i in range(NUM_CELLS)],
+    "categories": [("Yes", "No", "Unknown", "€5")[i % 4] for i in range(NUM_CELLS)],
+}
+
+
+def convert_with_numberise(values: list[str]):
+    for value in values:
+        with contextlib.suppress(ValueError):
+            numberise(value, ",", ".", DEFAULT_CURRENCY_SYMBOLS)
+
+
+def convert_with_parser(values: list[str]):
+    # A new parser for each run, so that its cache starts empty.
+    parse_number = number_parser(",", ".", DEFAULT_CURRENCY_SYMBOLS)
+    for value in values:
+        parse_number(value)
+
+
+def main():
+    for name, values in COLUMNS.items():
+        for convert in (convert_with_numberise, convert_with_parser):
+            seconds = min(timeit.repeat(lambda: convert(values), number=5, repeat=5))
+            ns_per_cell = seconds / 5 / len(values) * 1e9
+            print(f"{name:<12} {convert.__name__:<24} {ns_per_cell:8.0f} ns/cell")
+
+
+if __name__ == "__main__":
+    main()
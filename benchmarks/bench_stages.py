@@ -0,0 +1,235 @@
+"""
+Benchmark each stage of converting a table --- parsing the document,
+selecting the table's rows, converting the rows to cells, and writing
+them as CSV --- for each kind of synthetic table in ``tables.py``.
+Prints the fastest time and the peak memory allocated for each stage.
+
+    $ python benchmarks/bench_stages.py
+
+To catch regressions, save the results from a known-good commit as a
+baseline, and then compare the results of a later commit against it.
+The command exits with status 1 if any stage has become slower, or
+allocates more memory, by more than the tolerance.
+
+    $ python benchmarks/bench_stages.py --save baseline.json
+    $ python benchmarks/bench_stages.py --compare baseline.json
+
+Peak memory is measured with :mod:`tracemalloc`, in a separate run from
+the timings so that tracing doesn't slow them down. It only counts
+memory allocated by Python, not by libxml2, so for the parse stage it
+covers little more than the document's tree of element proxies.
+"""
+
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+import click
+from tables import TABLES, generate
+
+from htmltab.extract import (
+    DEFAULT_CURRENCY_SYMBOLS,
+    DEFAULT_NULL_VALUES,
+    convert_rows,
+    pad_rows,
+    select_rows,
+)
+from htmltab.utils import parse_html
+from htmltab.writers import write_csv
+
+STAGES = ("parse", "select", "convert", "write")
+
+# Format version of the saved results, incremented if it ever changes.
+RESULTS_VERSION = 1
+
+
+def run_stages(html: bytes) -> dict[str, Callable[[], Any]]:
+    """
+    Return a function for each stage that runs the stage on ``html``.
+    Each stage's input is the output of the stage before, which is
+    computed once here so that it isn't included in the timings.
+    """
+    doc = parse_html(html)
+    elements = select_rows(doc, "1")
+    rows = pad_rows(
+        convert_rows(
+            elements, DEFAULT_NULL_VALUES, True, ",", ".", DEFAULT_CURRENCY_SYMBOLS
+        )
+    )
+    return {
+        "parse": lambda: parse_html(html),
+        "select": lambda: select_rows(doc, "1"),
+        "convert": lambda: pad_rows(
+            convert_rows(
+                elements, DEFAULT_NULL_VALUES, True, ",", ".", DEFAULT_CURRENCY_SYMBOLS
+            )
+        ),
+        "write": lambda: write_csv(rows, io.StringIO()),
+    }
+
+
+def best_time(stage: Callable[[], Any], repeat: int) -> float:
+    """
+    Return the fastest of ``repeat`` runs of ``stage``, in seconds. The
+    fastest run is the one least disturbed by other processes.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        stage()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def peak_memory(stage: Callable[[], Any]) -> int:
+    """
+    Return the peak number of bytes allocated by Python while running
+    ``stage``, over and above what was allocated before it started.
+    """
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        stage()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - start
+
+
+def benchmark(names: list[str], scale: float, repeat: int) -> dict[str, Any]:
+    """
+    Benchmark every stage for each of the named tables, and return the
+    results, keyed by "<table>/<stage>".
+    """
+    results = {}
+    for name in names:
+        stages = run_stages(generate(name, scale))
+        for stage_name in STAGES:
+            results[f"{name}/{stage_name}"] = {
+                "seconds": best_time(stages[stage_name], repeat),
+                "peak_bytes": peak_memory(stages[stage_name]),
+            }
+    return {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "scale": scale,
+        "results": results,
+    }
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], tolerance: float):
+    """
+    Print each result alongside its change from the baseline, and return
+    the names of the results that have regressed by more than
+    ``tolerance`` (a fraction, e.g. 0.2 for 20%).
+    """
+    if baseline.get("scale") != results["scale"]:
+        click.echo(
+            f"warning: baseline scale {baseline.get('scale')} differs from "
+            f"{results['scale']}",
+            err=True,
+        )
+    regressions = []
+    for key, result in results["results"].items():
+        base = baseline["results"].get(key)
+        if base is None:
+            print_result(key, result)
+            continue
+        time_change = result["seconds"] / base["seconds"] - 1
+        memory_change = result["peak_bytes"] / max(base["peak_bytes"], 1) - 1
+        regressed = time_change > tolerance or memory_change > tolerance
+        if regressed:
+            regressions.append(key)
+        print_result(
+            key,
+            result,
+            f"{time_change:+7.1%} {memory_change:+7.1%}"
+            + ("  REGRESSED" if regressed else ""),
+        )
+    return regressions
+
+
+def print_result(key: str, result: dict[str, Any], change: str = ""):
+    click.echo(
+        f"{key:<18} {result['seconds'] * 1000:10.2f} ms "
+        f"{result['peak_bytes'] / 1024:10.0f} KiB  {change}".rstrip()
+    )
+
+
+@click.command()
+@click.option(
+    "--table",
+    "names",
+    type=click.Choice(list(TABLES)),
+    multiple=True,
+    help="Kind of table to benchmark. Can be given more than once. [default: all]",
+)
+@click.option(
+    "--scale",
+    type=click.FloatRange(min=0, min_open=True),
+    default=1.0,
+    show_default=True,
+    help="Multiply the number of rows in each table by this.",
+)
+@click.option(
+    "--repeat",
+    type=click.IntRange(min=1),
+    default=5,
+    show_default=True,
+    help="Number of times to time each stage. The fastest time is kept.",
+)
+@click.option(
+    "--save",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Save the results as JSON to this file, for use as a baseline.",
+)
+@click.option(
+    "--compare",
+    "baseline_path",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="Compare the results against a baseline saved with --save.",
+)
+@click.option(
+    "--tolerance",
+    type=click.FloatRange(min=0),
+    default=0.2,
+    show_default=True,
+    help="Fraction by which a stage can be slower, or use more memory, "
+    "than the baseline before it's counted as a regression.",
+)
+def main(
+    names: tuple[str, ...],
+    scale: float,
+    repeat: int,
+    save: Path | None,
+    baseline_path: Path | None,
+    tolerance: float,
+):
+    """
+    Benchmark each stage of converting synthetic HTML tables.
+    """
+    results = benchmark(list(names or TABLES), scale, repeat)
+    click.echo(f"{'stage':<18} {'time':>13} {'peak memory':>14}")
+    if baseline_path is not None:
+        baseline = json.loads(baseline_path.read_text())
+        if baseline.get("version") != RESULTS_VERSION:
+            raise click.UsageError(f"{baseline_path} is not a compatible baseline")
+        regressions = compare(results, baseline, tolerance)
+    else:
+        regressions = []
+        for key, result in results["results"].items():
+            print_result(key, result)
+    if save is not None:
+        save.write_text(json.dumps(results, indent=2) + "\n")
+    if regressions:
+        click.echo(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
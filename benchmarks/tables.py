@@ -0,0 +1,168 @@
+"""
+Generators for synthetic HTML tables used by the benchmarks. Each
+generator returns a whole HTML document, as UTF-8 bytes, containing one
+table whose shape stresses a different part of the conversion: many
+columns, many rows, nested tables, cells spanning rows and columns, or
+cells that are mostly numbers or mostly text.
+
+The documents are generated from a fixed seed, so the same arguments
+always produce the same document.
+"""
+
+import random
+from typing import Callable
+
+SEED = 20240131
+
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua"
+).split()
+
+
+def document(rows: list[str], header: str = "") -> bytes:
+    """
+    Return a whole HTML document containing a table with the given
+    (already rendered) header and body rows.
+    """
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Benchmark</title>'
+        f"</head><body><table><thead>{header}</thead><tbody>\n"
+        + "\n".join(rows)
+        + "\n</tbody></table></body></html>\n"
+    ).encode("utf-8")
+
+
+def header_row(num_columns: int) -> str:
+    return (
+        "<tr>" + "".join(f"<th>Column {i}</th>" for i in range(num_columns)) + "</tr>"
+    )
+
+
+def wide(num_rows: int, num_columns: int = 500) -> bytes:
+    """
+    A table with few rows but hundreds of columns of short values.
+    """
+    rnd = random.Random(SEED)
+    rows = [
+        "<tr>"
+        + "".join(f"<td>{rnd.randint(0, 999)}</td>" for _ in range(num_columns))
+        + "</tr>"
+        for _ in range(num_rows)
+    ]
+    return document(rows, header_row(num_columns))
+
+
+def tall(num_rows: int, num_columns: int = 6) -> bytes:
+    """
+    A table with tens of thousands of rows of mixed short values.
+    """
+    rnd = random.Random(SEED)
+    rows = [
+        f"<tr><td>{i}</td><td>{rnd.choice(WORDS)}</td>"
+        + "".join(
+            f"<td>{rnd.uniform(0, 1000):.2f}</td>" for _ in range(num_columns - 2)
+        )
+        + "</tr>"
+        for i in range(num_rows)
+    ]
+    return document(rows, header_row(num_columns))
+
+
+def nested(num_rows: int) -> bytes:
+    """
+    A table whose rows each contain a small table within a cell, so that
+    the text of cells with child elements has to be extracted.
+    """
+    rnd = random.Random(SEED)
+    rows = []
+    for i in range(num_rows):
+        inner = "".join(
+            f"<tr><td>{rnd.choice(WORDS)}</td><td>{rnd.randint(0, 99)}</td></tr>"
+            for _ in range(3)
+        )
+        rows.append(
+            f"<tr><td>{i}</td><td><table>{inner}</table></td>"
+            f"<td>{rnd.choice(WORDS)}</td></tr>"
+        )
+    return document(rows, header_row(3))
+
+
+def colspan(num_rows: int, num_columns: int = 12) -> bytes:
+    """
+    A table in which most cells span several columns, and some span
+    several rows.
+    """
+    rnd = random.Random(SEED)
+    rows = []
+    for i in range(num_rows):
+        cells = []
+        remaining = num_columns
+        while remaining > 0:
+            span = min(rnd.randint(1, 4), remaining)
+            remaining -= span
+            # Every tenth row starts with a cell spanning the next two rows.
+            rowspan = ' rowspan="3"' if i % 10 == 0 and not cells else ""
+            cells.append(f'<td colspan="{span}"{rowspan}>{rnd.randint(0, 999)}</td>')
+        rows.append("<tr>" + "".join(cells) + "</tr>")
+    return document(rows, header_row(num_columns))
+
+
+def numeric(num_rows: int, num_columns: int = 8) -> bytes:
+    """
+    A table of number-like values: grouped numbers, decimals,
+    percentages, and amounts of currency.
+    """
+    rnd = random.Random(SEED)
+    formats = (
+        lambda: f"{rnd.randint(-(10**6), 10**6):,}",
+        lambda: f"{rnd.uniform(-1000, 1000):.3f}",
+        lambda: f"{rnd.uniform(0, 100):.1f}%",
+        lambda: f"${rnd.uniform(0, 10**5):,.2f}",
+    )
+    rows = [
+        "<tr>"
+        + "".join(f"<td>{formats[j % len(formats)]()}</td>" for j in range(num_columns))
+        + "</tr>"
+        for _ in range(num_rows)
+    ]
+    return document(rows, header_row(num_columns))
+
+
+def text(num_rows: int, num_columns: int = 4) -> bytes:
+    """
+    A table of long runs of text, with extra whitespace and inline markup
+    within the cells.
+    """
+    rnd = random.Random(SEED)
+    rows = []
+    for _ in range(num_rows):
+        cells = []
+        for j in range(num_columns):
+            words = rnd.choices(WORDS, k=rnd.randint(10, 40))
+            if j % 2:
+                words[0] = f"<b>{words[0]}</b>"
+            cells.append("<td>\n  " + "  ".join(words) + "\n</td>")
+        rows.append("<tr>" + "".join(cells) + "</tr>")
+    return document(rows, header_row(num_columns))
+
+
+# The generator for each kind of table, by name, and the number of rows in
+# the table at the default scale.
+TABLES: dict[str, tuple[Callable[[int], bytes], int]] = {
+    "wide": (wide, 200),
+    "tall": (tall, 50_000),
+    "nested": (nested, 5_000),
+    "colspan": (colspan, 10_000),
+    "numeric": (numeric, 20_000),
+    "text": (text, 20_000),
+}
+
+
+def generate(name: str, scale: float = 1.0) -> bytes:
+    """
+    Return the document for the named kind of table, with the number of
+    rows multiplied by ``scale``.
+    """
+    generator, num_rows = TABLES[name]
+    return generator(max(1, round(num_rows * scale)))
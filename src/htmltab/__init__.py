@@ -0,0 +1,36 @@
+from typing import Any
+
+from .extract import (
+    DEFAULT_CURRENCY_SYMBOLS,
+    DEFAULT_NULL_VALUES,
+    Cell,
+    Row,
+    extract_table,
+    extract_tables,
+)
+from .index import list_tables
+from .infer import infer_types
+from .utils import InvalidSelectorError
+
+__all__ = [
+    "DEFAULT_CURRENCY_SYMBOLS",
+    "DEFAULT_NULL_VALUES",
+    "Cell",
+    "InvalidSelectorError",
+    "Row",
+    "aextract_table",
+    "extract_table",
+    "extract_tables",
+    "infer_types",
+    "list_tables",
+]
+
+
+def __getattr__(name: str) -> Any:
+    # asyncio is slow to import, and the command-line utilities don't need it,
+    # so the asynchronous interface is only imported when it's first used.
+    if name == "aextract_table":
+        from .aio import aextract_table
+
+        return aextract_table
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
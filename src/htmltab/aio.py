@@ -0,0 +1,138 @@
+"""
+Asynchronous interface for programs built on :mod:`asyncio`, such as
+web services. Downloading, parsing, and converting a table all block,
+so they're run in an executor rather than in the event loop, and the
+rows are handed back to the event loop in batches. Many tables can then
+be extracted at the same time without holding up other tasks.
+
+    >>> import asyncio
+    >>> from htmltab import aextract_table
+    >>> async def main():
+    ...     rows = await aextract_table("<table><tr><td>1</td></tr></table>")
+    ...     return [row async for row in rows]
+    >>> asyncio.run(main())
+    [[Decimal('1')]]
+"""
+
+import asyncio
+import functools
+import itertools
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, AsyncIterator, Iterator
+
+from .extract import Row, Source, extract_table
+
+if TYPE_CHECKING:
+    from .fetch import Fetcher
+
+# Number of rows converted in the executor each time the event loop asks for
+# more. Handing rows over one at a time would spend more time switching
+# between threads than converting.
+BATCH_SIZE = 1000
+
+
+async def aextract_table(
+    source: Source,
+    select: str = "1",
+    *,
+    null_values: list[str] | None = None,
+    convert_numbers: bool = True,
+    group_symbol: str = ",",
+    decimal_symbol: str = ".",
+    currency_symbols: list[str] | None = None,
+    stream: bool = False,
+    encoding: str | None = None,
+    executor: Executor | None = None,
+    fetcher: "Fetcher | None" = None,
+    batch_size: int = BATCH_SIZE,
+) -> AsyncIterator[Row]:
+    """
+    Select a table within an HTML document and return an asynchronous
+    iterator over its rows. This is the asynchronous equivalent of
+    :func:`~htmltab.extract.extract_table`, which it runs in
+    ``executor``, and which it takes the same arguments as. In addition,
+    ``source`` may be an HTTP or HTTPS URL.
+
+    The document is parsed and the table selected before the iterator is
+    returned, so errors in doing so are raised by the ``await``. Rows are
+    then converted ``batch_size`` at a time, in ``executor``, as they're
+    requested.
+
+    Args:
+        executor: Executor to parse the document and convert the rows
+            in. It must run functions in this process (e.g. a
+            :class:`~concurrent.futures.ThreadPoolExecutor`). Defaults
+            to the event loop's default executor.
+        fetcher: Fetcher to download ``source`` with, if it's a URL. Pass
+            the same fetcher to each call to reuse connections. Defaults
+            to a new fetcher for each download.
+        batch_size: Number of rows to convert each time more rows are
+            needed.
+
+    Raises:
+        :class:`requests.exceptions.RequestException`: ``source`` is a
+            URL and downloading it failed
+
+    Otherwise raises the same exceptions as
+    :func:`~htmltab.extract.extract_table`.
+    """
+    loop = asyncio.get_running_loop()
+    if isinstance(source, str) and _is_url(source):
+        # Downloads spend their time waiting on the network, so they're run in
+        # the default executor to keep ``executor`` free for converting.
+        source, charset = await loop.run_in_executor(None, _fetch, source, fetcher)
+        encoding = encoding or charset
+    rows = await loop.run_in_executor(
+        executor,
+        functools.partial(
+            extract_table,
+            source,
+            select,
+            null_values=null_values,
+            convert_numbers=convert_numbers,
+            group_symbol=group_symbol,
+            decimal_symbol=decimal_symbol,
+            currency_symbols=currency_symbols,
+            stream=stream,
+            encoding=encoding,
+        ),
+    )
+    return _aiter_rows(rows, executor, batch_size)
+
+
+async def _aiter_rows(
+    rows: Iterator[Row], executor: Executor | None, batch_size: int
+) -> AsyncIterator[Row]:
+    """
+    Yield each row in ``rows``, converting them ``batch_size`` at a time
+    in ``executor``.
+    """
+    loop = asyncio.get_running_loop()
+    take = functools.partial(_take, rows, batch_size)
+    while batch := await loop.run_in_executor(executor, take):
+        for row in batch:
+            yield row
+
+
+def _take(rows: Iterator[Row], batch_size: int) -> list[Row]:
+    return list(itertools.islice(rows, batch_size))
+
+
+def _fetch(url: str, fetcher: "Fetcher | None") -> tuple[bytes, str | None]:
+    """
+    Download ``url``, and return the document along with the character
+    encoding declared by the server.
+    """
+    # Requests is slow to import, so it's only imported when it's needed.
+    from .fetch import Fetcher, response_charset
+
+    if fetcher is None:
+        with Fetcher() as fetcher:
+            response = fetcher.get(url)
+    else:
+        response = fetcher.get(url)
+    return response.content, response_charset(response)
+
+
+def _is_url(source: str) -> bool:
+    return source.startswith(("http://", "https://"))
@@ -0,0 +1,519 @@
+"""
+Command-line utility to convert tables in many HTML documents at once.
+Documents are converted in parallel across a pool of worker processes,
+and each table is written to its own CSV file. Remote documents are
+downloaded concurrently, and converted as soon as they've downloaded.
+"""
+
+import codecs
+import contextlib
+import csv
+import glob
+import io
+import itertools
+import os
+import re
+import urllib.parse
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any, Iterable, Iterator
+
+import click
+from lxml.etree import LxmlError
+
+from .extract import (
+    DEFAULT_CURRENCY_SYMBOLS,
+    DEFAULT_NULL_VALUES,
+    extract_table,
+    pad_rows,
+)
+from .parallel import process_pool
+
+if TYPE_CHECKING:
+    from .cache import DiskCache
+    from .fetch import Fetcher
+
+HTML_SUFFIXES = (".html", ".htm")
+
+# Number of documents sent to a worker process at a time. Sending documents in
+# chunks cuts down on the cost of inter-process communication when there are
+# many small documents.
+CHUNK_SIZE = 16
+
+# A local path or an HTTP/HTTPS URL.
+type Document = Path | str
+
+
+@click.command()
+@click.option(
+    "--manifest",
+    "-m",
+    type=click.File("r"),
+    help="File containing paths or URLs of HTML documents, one per line.",
+)
+@click.option(
+    "--output-dir",
+    "-O",
+    required=True,
+    type=click.Path(file_okay=False, writable=True, path_type=Path),
+    help="Directory to write CSV files to. Each HTML document is converted to a "
+    "CSV file with the same name, but with a '.csv' extension.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    help="Number of documents to convert in parallel.  [default: number of CPUs]",
+)
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=8,
+    show_default=True,
+    help="Number of URLs to download at the same time.",
+)
+@click.option(
+    "--per-host",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Number of URLs to download from a single host at the same time.",
+)
+@click.option(
+    "--timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    default=10,
+    show_default=True,
+    help="Number of seconds to wait for a server to respond.",
+)
+@click.option(
+    "--retries",
+    type=click.IntRange(min=0),
+    default=3,
+    show_default=True,
+    help="Number of times to retry a download that failed because of a "
+    "connection error or a 429 or 5xx response.",
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False, writable=True),
+    help="Cache responses from URLs in this directory. When the same URL is "
+    "requested again, the cached response is used if the server says the "
+    "document hasn't changed.",
+)
+@click.option(
+    "--result-cache-dir",
+    type=click.Path(file_okay=False, writable=True),
+    help="Cache the CSV output in this directory. When the same document is "
+    "converted again with the same options, the cached output is written "
+    "instead of converting the document again.",
+)
+@click.option(
+    "--cache-max-size",
+    type=click.IntRange(min=1),
+    default=100,
+    show_default=True,
+    help="Maximum size of each cache in megabytes. The least recently used "
+    "entries are removed when a cache grows larger than this.",
+)
+@click.option(
+    "--cache-max-age",
+    type=click.IntRange(min=1),
+    default=30,
+    show_default=True,
+    help="Number of days after which an unused entry is removed from a cache.",
+)
+@click.option(
+    "--select",
+    "-s",
+    default="1",
+    help="Integer index, CSS selector, or XPath expression that "
+    "determines the table to convert to CSV.",
+)
+@click.option(
+    "--null-value",
+    "-n",
+    multiple=True,
+    help="Case-sensitive value to convert to an empty cell in the "
+    "CSV output. Use multiple times if you have more than one "
+    "null value.  [default: '{}']".format("', '".join(DEFAULT_NULL_VALUES)),
+)
+@click.option(
+    "--convert-numbers/--keep-numbers",
+    "-c/-k",
+    is_flag=True,
+    default=True,
+    help="Convert number-like strings into numbers "
+    "(e.g. remove group symbols, percent signs) "
+    "or leave unchanged.  [default: convert]",
+)
+@click.option(
+    "--group-symbol",
+    "-g",
+    default=",",
+    show_default=True,
+    help="Symbol used to group digits in numbers (e.g. the ',' in '1,000.00').",
+)
+@click.option(
+    "--decimal-symbol",
+    "-d",
+    default=".",
+    show_default=True,
+    help="Symbol used to separate integer from fraction in numbers "
+    "(e.g. the '.' in '1,000.00').",
+)
+@click.option(
+    "--currency-symbol",
+    "-u",
+    multiple=True,
+    help="Currency symbol to remove when converting number-like "
+    "strings. Use multiple times if you have more than one "
+    "currency symbol  [default: '{}']".format("', '".join(DEFAULT_CURRENCY_SYMBOLS)),
+)
+@click.option(
+    "--delimiter",
+    "-e",
+    type=str,
+    default=",",
+    show_default=True,
+    help="Character used to separate fields in the CSV output",
+)
+@click.option(
+    "--encoding",
+    help="Character encoding of the HTML documents (e.g. 'utf-8' or "
+    "'windows-1252'). By default the encoding of each document is detected "
+    "from its byte order mark, the HTTP 'Content-Type' header, or a 'meta' "
+    "element in the document.",
+)
+@click.argument("inputs", nargs=-1)
+@click.version_option()
+def main(
+    manifest: IO[str] | None,
+    output_dir: Path,
+    jobs: int | None,
+    concurrency: int,
+    per_host: int,
+    timeout: float,
+    retries: int,
+    cache_dir: str | None,
+    result_cache_dir: str | None,
+    cache_max_size: int,
+    cache_max_age: int,
+    select: str,
+    null_value: list[str],
+    convert_numbers: bool,
+    group_symbol: str,
+    decimal_symbol: str,
+    currency_symbol: list[str],
+    delimiter: str,
+    encoding: str | None,
+    inputs: list[str],
+):
+    """
+    <https://flother.github.io/htmltab>
+
+    Convert a table in each of many HTML documents to CSV, converting
+    documents in parallel. Inputs can be paths to HTML files, glob
+    patterns, directories (which are searched recursively for '.html'
+    and '.htm' files), or HTTP/HTTPS URLs. Paths and URLs can also be
+    listed, one per line, in a manifest file passed using '--manifest'.
+
+    URLs are downloaded concurrently over a shared connection pool, and
+    failed downloads are retried.
+
+    To convert the table with the id 'data' in every HTML file in the
+    'pages' directory, writing the CSV files to 'csv':
+
+      htmltab-batch --select table#data --output-dir csv pages
+
+    If a document can't be converted, the error is reported and the
+    remaining documents are still converted. The exit status is non-zero
+    if any document failed.
+    """
+    if len(delimiter) != 1:
+        raise click.UsageError("delimiter must be a single character")
+    if encoding is not None:
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            raise click.BadParameter(
+                f"unknown encoding '{encoding}'", param_hint="'--encoding'"
+            )
+
+    documents = list(find_documents(inputs))
+    if manifest is not None:
+        documents += [
+            (_document(line.strip()), None) for line in manifest if line.strip()
+        ]
+    if not documents:
+        raise click.UsageError("no HTML documents to convert")
+
+    # Work out every output path up front, so two documents that would both be
+    # written to the same CSV file are caught before anything is converted. A
+    # document given more than once (e.g. by overlapping inputs) is only
+    # converted once.
+    output_paths: dict[Path, Document] = {}
+    seen: set[Document] = set()
+    for path, root in documents:
+        key = path.resolve() if isinstance(path, Path) else path
+        if key in seen:
+            continue
+        seen.add(key)
+        output_path = output_dir / output_filename(path, root)
+        if output_path in output_paths:
+            raise click.UsageError(
+                f"{output_paths[output_path]} and {path} would both be written "
+                f"to {output_path}"
+            )
+        output_paths[output_path] = path
+    for output_path in output_paths:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    options = {
+        "select": select,
+        "null_values": null_value,
+        "convert_numbers": convert_numbers,
+        "group_symbol": group_symbol,
+        "decimal_symbol": decimal_symbol,
+        "currency_symbols": currency_symbol,
+        "encoding": encoding,
+    }
+    tasks = [(path, output_path) for output_path, path in output_paths.items()]
+    result_cache = None
+    if result_cache_dir is not None:
+        from .cache import DiskCache
+
+        result_cache = DiskCache(
+            result_cache_dir,
+            max_size=cache_max_size * 1024 * 1024,
+            max_age=cache_max_age * 24 * 60 * 60,
+        )
+    # Requests is slow to import, so a fetcher is only created (and Requests
+    # only imported) when there are URLs to download.
+    fetcher_context: contextlib.AbstractContextManager["Fetcher | None"]
+    if any(isinstance(path, str) for path, _ in tasks):
+        from .cache import DiskCache
+        from .fetch import Fetcher
+
+        cache = None
+        if cache_dir is not None:
+            cache = DiskCache(
+                cache_dir,
+                max_size=cache_max_size * 1024 * 1024,
+                max_age=cache_max_age * 24 * 60 * 60,
+            )
+        fetcher_context = Fetcher(concurrency, per_host, timeout, retries, cache=cache)
+    else:
+        fetcher_context = contextlib.nullcontext()
+    num_failed = 0
+    with fetcher_context as fetcher:
+        for path, error in convert_files(
+            tasks, options, delimiter, jobs, fetcher, result_cache
+        ):
+            if error is not None:
+                num_failed += 1
+                click.echo(f"{path}: {error}", err=True)
+    if result_cache is not None:
+        result_cache.evict()
+    if num_failed:
+        click.echo(
+            f"Failed to convert {num_failed} of {len(tasks)} documents", err=True
+        )
+        raise SystemExit(1)
+
+
+def find_documents(inputs: Iterable[str]) -> Iterator[tuple[Document, Path | None]]:
+    """
+    Yield the path or URL of each HTML document given by ``inputs``,
+    which can be paths to files, glob patterns, directories, or URLs.
+    Each is yielded along with the directory its output is written
+    relative to: the directory that was searched, or the part of the
+    glob pattern before any wildcards. That's ``None`` for files given
+    by name and for URLs.
+    """
+    for value in inputs:
+        if _is_url(value):
+            yield value, None
+        elif any(char in value for char in "*?["):
+            root = _glob_root(value)
+            for match in sorted(glob.glob(value, recursive=True)):
+                yield Path(match), root
+        elif os.path.isdir(value):
+            for dirpath, _, filenames in sorted(os.walk(value)):
+                for filename in sorted(filenames):
+                    if filename.lower().endswith(HTML_SUFFIXES):
+                        yield Path(dirpath, filename), Path(value)
+        else:
+            yield Path(value), None
+
+
+def output_filename(document: Document, root: Path | None = None) -> str:
+    """
+    Return the name of the CSV file to write the table in ``document``
+    to. For a local file that's the file's path relative to ``root``
+    (or just its name, if ``root`` is ``None``) with a '.csv' extension,
+    and for a URL it's the URL's host and path (and query string, if it
+    has one) with any characters that aren't safe in filenames replaced.
+    """
+    if isinstance(document, Path):
+        if root is None:
+            return document.with_suffix(".csv").name
+        return document.relative_to(root).with_suffix(".csv").as_posix()
+    url = urllib.parse.urlparse(document)
+    name = url.netloc + os.path.splitext(url.path)[0]
+    if url.query:
+        name += "_" + url.query
+    return re.sub(r"[^\w.-]+", "_", name).strip("_") + ".csv"
+
+
+def convert_files(
+    tasks: list[tuple[Document, Path]],
+    options: dict[str, Any],
+    delimiter: str,
+    jobs: int | None,
+    fetcher: "Fetcher | None" = None,
+    result_cache: "DiskCache | None" = None,
+) -> Iterator[tuple[Document, str | None]]:
+    """
+    Convert each ``(document, output_path)`` pair in ``tasks``, yielding
+    the path or URL of each document along with an error message, or
+    ``None`` if it was converted successfully. Results for local files
+    are yielded in the same order as ``tasks``, followed by the results
+    for URLs in the order they finished downloading.
+
+    The documents are converted in a pool of ``jobs`` worker processes,
+    or in a single background thread of this process if ``jobs`` is 1.
+    URLs are downloaded using ``fetcher``, and each document is handed
+    to the pool as soon as it's been downloaded so that downloading and
+    converting happen at the same time. If ``result_cache`` is given,
+    output is reused from and stored in it (see :func:`convert_file`).
+    """
+    files = [(path, output) for path, output in tasks if isinstance(path, Path)]
+    urls = {url: output for url, output in tasks if isinstance(url, str)}
+    executor: Executor
+    if jobs == 1:
+        executor = ThreadPoolExecutor(max_workers=1)
+    else:
+        executor = process_pool(jobs)
+    with executor:
+        file_results = executor.map(
+            _convert_file,
+            [
+                (path, path, output, options, delimiter, result_cache)
+                for path, output in files
+            ],
+            chunksize=CHUNK_SIZE,
+        )
+        url_results: list[tuple[Document, str] | Future] = []
+        if urls:
+            from .fetch import Fetcher, describe_error, response_charset
+
+            fetcher = fetcher or Fetcher()
+            for url, response in fetcher.fetch_all(urls):
+                if isinstance(response, Exception):
+                    url_results.append((url, describe_error(response, url)))
+                else:
+                    url_options = dict(options)
+                    url_options["encoding"] = options.get(
+                        "encoding"
+                    ) or response_charset(response)
+                    args = (
+                        url,
+                        response.content,
+                        urls[url],
+                        url_options,
+                        delimiter,
+                        result_cache,
+                    )
+                    url_results.append(executor.submit(_convert_file, args))
+        yield from file_results
+        for result in url_results:
+            yield result.result() if isinstance(result, Future) else result
+
+
+def convert_file(
+    source: Path | bytes,
+    output_path: Path,
+    options: dict[str, Any],
+    delimiter: str,
+    result_cache: "DiskCache | None" = None,
+):
+    """
+    Convert the table selected within ``source`` --- the path to a local
+    HTML file, or an HTML document as bytes --- and write it to
+    ``output_path`` as CSV. ``options`` are passed to
+    :func:`~htmltab.extract.extract_table`.
+
+    If ``result_cache`` is given and it holds the output of converting
+    the same document with the same options, by this command or by
+    ``htmltab``, that output is written instead. Otherwise the output is
+    stored in the cache.
+    """
+    key = None
+    if result_cache is not None:
+        from .results import document_digest, result_key
+
+        digest, source = document_digest(source)  # type: ignore[assignment]
+        key = result_key(
+            digest,
+            {**options, "select": [options["select"]], "delimiter": delimiter},
+        )
+        cached = result_cache.get(key)
+        if cached is not None and len(cached[1]["lengths"]) == 1:
+            with open(output_path, "w", newline="") as fh:
+                fh.write(cached[0].decode("utf-8"))
+            return
+    rows = pad_rows(extract_table(source, **options))
+    if key is None or result_cache is None:
+        with open(output_path, "w", newline="") as fh:
+            csv.writer(fh, delimiter=delimiter).writerows(rows)
+        return
+    # Keep a copy of the output to store in the cache.
+    output = io.StringIO()
+    csv.writer(output, delimiter=delimiter).writerows(rows)
+    with open(output_path, "w", newline="") as fh:
+        fh.write(output.getvalue())
+    data = output.getvalue().encode("utf-8")
+    if len(data) <= result_cache.max_size:
+        result_cache.set(key, data, {"lengths": [len(data)]})
+
+
+def _convert_file(
+    args: tuple[Document, Path | bytes, Path, dict[str, Any], str, "DiskCache | None"],
+) -> tuple[Document, str | None]:
+    """
+    Call :func:`convert_file`, and return the document's path or URL
+    along with an error message rather than raising an exception if the
+    document can't be converted.
+    """
+    document, *convert_args = args
+    try:
+        convert_file(*convert_args)
+    except (LxmlError, TypeError):
+        return document, "could not parse HTML"
+    except (OSError, ValueError) as err:
+        return document, str(err)
+    return document, None
+
+
+def _document(value: str) -> Document:
+    """
+    Return ``value`` as-is if it's a URL, otherwise as a path.
+    """
+    return value if _is_url(value) else Path(value)
+
+
+def _glob_root(pattern: str) -> Path:
+    """
+    Return the directory that every path matching the glob ``pattern``
+    is within: the part of the pattern before the first wildcard.
+    """
+    parts = Path(pattern).parts
+    root = itertools.takewhile(
+        lambda part: not any(char in part for char in "*?["), parts[:-1]
+    )
+    return Path(*root)
+
+
+def _is_url(value: str) -> bool:
+    return urllib.parse.urlparse(value).scheme in ("http", "https")
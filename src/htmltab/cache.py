@@ -0,0 +1,130 @@
+"""
+A simple on-disk cache. Each entry is a blob of bytes plus a small JSON
+document of metadata, stored in files named after a hash of the entry's
+key. Entries that haven't been used for a while are evicted, as are the
+least recently used entries once the cache grows beyond a maximum size.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+DEFAULT_MAX_SIZE = 100 * 1024 * 1024  # 100 MB
+DEFAULT_MAX_AGE = 30 * 24 * 60 * 60  # 30 days
+
+
+class DiskCache:
+    """
+    Store bytes on disk, keyed by a string.
+
+    Args:
+        directory: Directory to store the cache's files in. It's created
+            if it doesn't exist.
+        max_size: Maximum total size, in bytes, of the cached data. When
+            :meth:`evict` is called, the least recently used entries are
+            removed until the cache is no larger than this.
+        max_age: Maximum number of seconds since an entry was last used.
+            Older entries are removed when :meth:`evict` is called.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike[str],
+        max_size: int = DEFAULT_MAX_SIZE,
+        max_age: float = DEFAULT_MAX_AGE,
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.max_age = max_age
+
+    def get(self, key: str) -> tuple[bytes, dict[str, Any]] | None:
+        """
+        Return the data and metadata stored under ``key``, or ``None`` if
+        there's no such entry.
+        """
+        data_path, metadata_path = self._paths(key)
+        try:
+            with open(metadata_path, encoding="utf-8") as fh:
+                metadata = json.load(fh)
+            data = data_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+        # The modification time of the data file records when the entry was
+        # last used, for least-recently-used eviction.
+        self._touch(data_path)
+        return data, metadata
+
+    def set(self, key: str, data: bytes, metadata: dict[str, Any] | None = None):
+        """
+        Store ``data`` and ``metadata`` under ``key``, replacing any
+        existing entry.
+        """
+        data_path, metadata_path = self._paths(key)
+        self._write(metadata_path, json.dumps(metadata or {}).encode("utf-8"))
+        self._write(data_path, data)
+
+    def update(self, key: str, metadata: dict[str, Any]):
+        """
+        Replace the metadata stored under ``key``, without changing its
+        data.
+        """
+        _, metadata_path = self._paths(key)
+        self._write(metadata_path, json.dumps(metadata).encode("utf-8"))
+
+    def evict(self):
+        """
+        Remove entries that haven't been used within ``max_age`` seconds,
+        and then remove the least recently used entries until the cache
+        is no larger than ``max_size`` bytes.
+        """
+        entries = []
+        for data_path in self.directory.glob("*.data"):
+            try:
+                stat = data_path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, data_path))
+        entries.sort()
+        total_size = sum(size for _, size, _ in entries)
+        oldest = time.time() - self.max_age
+        for last_used, size, data_path in entries:
+            if last_used >= oldest and total_size <= self.max_size:
+                break
+            for path in (data_path, data_path.with_suffix(".json")):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+            total_size -= size
+
+    def _paths(self, key: str) -> tuple[Path, Path]:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return (
+            self.directory / f"{digest}.data",
+            self.directory / f"{digest}.json",
+        )
+
+    def _write(self, path: Path, data: bytes):
+        """
+        Write ``data`` to ``path`` atomically, so other threads or
+        processes never see a partly-written file.
+        """
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def _touch(self, path: Path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
@@ -4,30 +4,59 @@ Command-line utility to parse an HTML document, find a particular
 output the CSV to ``stdout``.
 """
 
+import codecs
 import contextlib
-import csv
-from decimal import Decimal
-from typing import IO, Any, Callable
+import functools
+import importlib.util
+import itertools
+import json
+from typing import IO, TYPE_CHECKING, Any, Callable, Iterable, Iterator
 
 import click
 from lxml.etree import LxmlError
 
-from .utils import numberise, open_file_or_url, parse_html, select_elements
-
-DEFAULT_NULL_VALUES = ["NA", "N/A", ".", "-"]
-DEFAULT_CURRENCY_SYMBOLS = ["$", "¥", "£", "€"]
+from . import stats
+from .extract import (
+    DEFAULT_CURRENCY_SYMBOLS,
+    DEFAULT_NULL_VALUES,
+    Row,
+    extract_table,
+    extract_tables,
+    fill_rows,
+    pad_rows,
+)
+from .index import list_tables
+from .infer import infer_types as infer
+from .utils import InvalidSelectorError, open_file_or_url
+from .writers import BINARY_FORMATS, WRITERS
 
-type Cell = None | Decimal | str
-type Row = list[Cell]
+if TYPE_CHECKING:
+    from .fetch import Fetcher
 
 
 @click.command()
 @click.option(
     "--select",
     "-s",
-    default="1",
+    multiple=True,
+    default=["1"],
     help="Integer index, CSS selector, or XPath expression that "
-    "determines the table to convert to CSV.",
+    "determines the table to convert to CSV. Use multiple times to convert "
+    "more than one table (requires '--output-template').  [default: 1]",
+)
+@click.option(
+    "--all-tables",
+    is_flag=True,
+    help="Convert every table in the HTML document (requires '--output-template').",
+)
+@click.option(
+    "--list",
+    "list_only",
+    is_flag=True,
+    help="List every table in the HTML document instead of converting one. "
+    "Each table is written as a JSON object on its own line, giving its index, "
+    "id, classes, selectors, nesting depth, caption, number of rows and "
+    "columns, and first row.",
 )
 @click.option(
     "--null-value",
@@ -46,6 +75,14 @@ type Row = list[Cell]
     "(e.g. remove group symbols, percent signs) "
     "or leave unchanged.  [default: convert]",
 )
+@click.option(
+    "--infer-types",
+    is_flag=True,
+    help="Infer the type of each column (integer, decimal, percent, currency, "
+    "date, or text) from its first 1,000 rows, and convert every cell in the "
+    "column to that type. The first row is treated as a header and left as-is. "
+    "Replaces '--convert-numbers'.",
+)
 @click.option(
     "--group-symbol",
     "-g",
@@ -77,6 +114,18 @@ type Row = list[Cell]
     show_default=True,
     help="Character used to separate fields in the CSV output",
 )
+@click.option(
+    "--format",
+    "-f",
+    "output_format",
+    type=click.Choice(list(WRITERS)),
+    default="csv",
+    show_default=True,
+    help="Format to write the table in. 'ndjson' writes each row as a JSON "
+    "array on its own line. 'parquet' uses the first row for column names, "
+    "keeps numbers and null values as typed columns, and requires the "
+    "'pyarrow' package.",
+)
 @click.option(
     "--output",
     "-o",
@@ -84,18 +133,132 @@ type Row = list[Cell]
     default="-",
     help="Write output to file instead of stdout",
 )
+@click.option(
+    "--output-template",
+    help="Write each table to its own file, named using this template. "
+    "'{n}' in the template is replaced by the number of the table, "
+    "starting at 1 (e.g. 'table-{n}.csv').",
+)
+@click.option(
+    "--pad/--no-pad",
+    default=True,
+    help="Add empty cells to the end of rows so that all rows have the same "
+    "number of fields, or write rows as they are. Padding means no output is "
+    "written until the whole table has been converted.  [default: pad]",
+)
+@click.option(
+    "--columns",
+    type=click.IntRange(min=1),
+    help="Pad rows to this number of fields. Rows are written as soon as "
+    "they're converted, without waiting for the rest of the table. Rows with "
+    "more fields than this aren't truncated.",
+)
+@click.option(
+    "--offset",
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+    help="Number of rows to skip at the start of the table.",
+)
+@click.option(
+    "--limit",
+    type=click.IntRange(min=0),
+    help="Maximum number of rows to write. No more rows are converted once "
+    "this many have been written, and when streaming the rest of the "
+    "document isn't read.",
+)
+@click.option(
+    "--stream/--no-stream",
+    default=False,
+    help="Parse the HTML document incrementally and write each row as soon "
+    "as it has been parsed, instead of reading the whole document first. "
+    "'--select' must be an integer index or a simple CSS selector (e.g. "
+    "'table#id' or 'table.class'). Rows are only padded if '--columns' is "
+    "given.  [default: no-stream]",
+)
+@click.option(
+    "--encoding",
+    help="Character encoding of the HTML document (e.g. 'utf-8' or "
+    "'windows-1252'). By default the encoding is detected from the "
+    "document's byte order mark, the HTTP 'Content-Type' header, or a "
+    "'meta' element in the document.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of processes to convert the table's rows in. Rows are "
+    "converted in chunks, and the output is the same however many processes "
+    "are used. Only worth using for tables with many thousands of rows.",
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False, writable=True),
+    help="Cache responses from URLs in this directory. When the same URL is "
+    "requested again, the cached response is used if the server says the "
+    "document hasn't changed.",
+)
+@click.option(
+    "--result-cache-dir",
+    type=click.Path(file_okay=False, writable=True),
+    help="Cache the output in this directory. When the same document is "
+    "converted again with the same options, the cached output is written "
+    "instead of converting the document again.",
+)
+@click.option(
+    "--cache-max-size",
+    type=click.IntRange(min=1),
+    default=100,
+    show_default=True,
+    help="Maximum size of each cache in megabytes. The least recently used "
+    "entries are removed when a cache grows larger than this.",
+)
+@click.option(
+    "--cache-max-age",
+    type=click.IntRange(min=1),
+    default=30,
+    show_default=True,
+    help="Number of days after which an unused entry is removed from a cache.",
+)
+@click.option(
+    "--profile/--no-profile",
+    default=False,
+    help="Once finished, write the time taken by each stage (fetching, "
+    "decoding, parsing, selecting, converting, and writing), the bytes, "
+    "rows, and cells each stage processed, and the peak memory used, to "
+    "stderr as JSON.  [default: no-profile]",
+)
 @click.argument("html_file", callback=open_file_or_url, default="-")
 @click.version_option()
 def main(
-    select: str,
+    select: list[str],
+    all_tables: bool,
+    list_only: bool,
     null_value: list[str],
     convert_numbers: bool,
+    infer_types: bool,
     group_symbol: str,
     decimal_symbol: str,
     currency_symbol: list[str],
     delimiter: str,
+    output_format: str,
     output: IO[Any],
-    html_file: Callable[[], str],
+    output_template: str | None,
+    pad: bool,
+    columns: int | None,
+    offset: int,
+    limit: int | None,
+    stream: bool,
+    encoding: str | None,
+    jobs: int,
+    cache_dir: str | None,
+    result_cache_dir: str | None,
+    cache_max_size: int,
+    cache_max_age: int,
+    profile: bool,
+    html_file: Callable[[Callable[[], "Fetcher"] | None], IO[Any]],
 ):
     """
     <https://flother.github.io/htmltab>
@@ -123,7 +286,31 @@ def main(
       htmltab --select "(//div[@id='bar']//table)[2]/tbody/tr" foo.html
 
     The CSV data will be output to stdout unless the '--output' option
-    is specified.
+    is specified. To start writing rows before the whole table has been
+    converted, pass the number of columns using '--columns', or turn off
+    padding with '--no-pad'.
+
+    To write rows as soon as they're parsed from a very large document:
+
+      htmltab --stream --select table#data huge.html
+
+    To preview the first 50 rows of a table, without reading the rest of
+    the document:
+
+      htmltab --stream --limit 50 huge.html
+
+    To convert a table with millions of rows using four processes:
+
+      htmltab --jobs 4 huge.html
+
+    To convert every table in the document, parsing it only once, and
+    write each table to its own file:
+
+      htmltab --all-tables --output-template "table-{n}.csv" foo.html
+
+    To find the table to convert, list every table in the document:
+
+      htmltab --list foo.html
     """
     # Ensure ``SIGPIPE`` doesn't throw an exception. This prevents the
     # ``[Errno 32] Broken pipe`` error you see when, e.g., piping to ``head``.
@@ -136,106 +323,288 @@ def main(
         # Do nothing on platforms without signals or ``SIGPIPE``.
         pass
 
+    # Measure every stage from here on, and report the measurements when the
+    # command finishes, whether or not it succeeds.
+    if profile:
+        collector = stats.Collector()
+        stats.add_hook(collector)
+        click.get_current_context().call_on_close(lambda: report(collector))
+
     # Check the CSV delimiter is a single character before requesting and
     # parsing the HTML.
     if len(delimiter) != 1:
         raise click.UsageError("delimiter must be a single character")
+    if encoding is not None:
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            raise click.BadParameter(
+                f"unknown encoding '{encoding}'", param_hint="'--encoding'"
+            )
+
+    if output_format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        raise click.UsageError(
+            "--format parquet requires pyarrow (pip install 'htmltab[parquet]')"
+        )
+
+    # Check the output template is valid before requesting and parsing the
+    # HTML, and that there's somewhere to write multiple tables.
+    if output_template is not None:
+        try:
+            output_template.format(n=1)
+        except (IndexError, KeyError, ValueError):
+            raise click.BadParameter(
+                "must contain no placeholders other than '{n}'",
+                param_hint="'--output-template'",
+            )
+        if stream:
+            raise click.UsageError("--stream can't be used with --output-template")
+    elif all_tables or len(select) > 1:
+        raise click.UsageError(
+            "--output-template is required when converting more than one table"
+        )
+
+    # Open the file or request the URL, using the cache if there is one. The
+    # cache and fetcher are only created if the document is a URL.
+    if cache_dir is None:
+        source = html_file(None)
+    else:
+        source = html_file(
+            functools.partial(make_fetcher, cache_dir, cache_max_size, cache_max_age)
+        )
+
+    # Documents from URLs may have had their encoding declared by the server.
+    encoding = encoding or getattr(source, "charset", None)
+
+    # List the tables, in a single incremental parse, rather than convert any.
+    if list_only:
+        try:
+            for info in list_tables(source, encoding):
+                output.write(json.dumps(info, ensure_ascii=False) + "\n")
+        except (LxmlError, TypeError):
+            raise click.UsageError("could not parse HTML")
+        return
+
+    # When inferring column types, numbers are converted column by column
+    # after the rows have been extracted, rather than cell by cell.
+    if infer_types:
+        convert_numbers = False
 
-    # Parse file contents as HTML.
+    # If the same document has been converted with the same options before,
+    # and the output is in the result cache, write that instead.
+    result_cache = None
+    if result_cache_dir is not None:
+        from .cache import DiskCache
+        from .results import CapturingFile, document_digest, result_key, split_result
+
+        result_cache = DiskCache(
+            result_cache_dir,
+            max_size=cache_max_size * 1024 * 1024,
+            max_age=cache_max_age * 24 * 60 * 60,
+        )
+        digest, source = document_digest(source)
+        result_cache_key = result_key(
+            digest,
+            {
+                "select": None if all_tables else select,
+                "null_values": null_value,
+                "convert_numbers": convert_numbers,
+                "infer_types": infer_types,
+                "group_symbol": group_symbol,
+                "decimal_symbol": decimal_symbol,
+                "currency_symbols": currency_symbol,
+                "delimiter": delimiter,
+                "format": output_format,
+                "pad": pad,
+                "columns": columns,
+                "offset": offset,
+                "limit": limit,
+                "stream": stream,
+                "encoding": encoding,
+            },
+        )
+        cached = result_cache.get(result_cache_key)
+        if cached is not None:
+            outputs = split_result(*cached)
+            check_output_template(output_template, len(outputs))
+            for n, data in enumerate(outputs, start=1):
+                with open_output(output, output_template, n, output_format) as fh:
+                    if output_format in BINARY_FORMATS:
+                        fh.write(data)
+                    else:
+                        fh.write(data.decode("utf-8"))
+            return
+
+    # Select the tables the user's interested in. Unless streaming, the HTML
+    # is parsed and the tables selected here, but the rows aren't converted
+    # until they're written.
     try:
-        doc = parse_html(html_file())
+        if output_template is None:
+            tables = [
+                extract_table(
+                    source,
+                    select[0],
+                    null_values=null_value,
+                    convert_numbers=convert_numbers,
+                    group_symbol=group_symbol,
+                    decimal_symbol=decimal_symbol,
+                    currency_symbols=currency_symbol,
+                    stream=stream,
+                    encoding=encoding,
+                    jobs=jobs,
+                )
+            ]
+        else:
+            tables = extract_tables(
+                source,
+                None if all_tables else select,
+                null_values=null_value,
+                convert_numbers=convert_numbers,
+                group_symbol=group_symbol,
+                decimal_symbol=decimal_symbol,
+                currency_symbols=currency_symbol,
+                encoding=encoding,
+                jobs=jobs,
+            )
+    except InvalidSelectorError as err:
+        raise click.BadParameter(str(err))
     except ValueError as err:
         raise click.UsageError(str(err))
     except (LxmlError, TypeError):
         raise click.UsageError("could not parse HTML")
 
-    # Select the elements that the user's interested in.
-    try:
-        elements = select_elements(doc, select)
-    except ValueError as err:
-        raise click.BadParameter(str(err))
+    if infer_types:
+        tables = [
+            infer(
+                rows,
+                group_symbol,
+                decimal_symbol,
+                list(currency_symbol) or DEFAULT_CURRENCY_SYMBOLS,
+            )
+            for rows in tables
+        ]
+
+    # Rows are converted lazily, so rows after the window aren't converted. When
+    # streaming, the rest of the document isn't even read.
+    if offset or limit is not None:
+        stop = None if limit is None else offset + limit
+        tables = [itertools.islice(rows, offset, stop) for rows in tables]
+
+    check_output_template(output_template, len(tables))
+
+    captured: list[CapturingFile] = []
+    for n, rows in enumerate(tables, start=1):
+        # Extra empty cells are added to the rows as required, to ensure that
+        # all rows have the same number of fields (as required by the closest
+        # thing CSV has to a specification, RFC 4180). If the user's said how
+        # many columns there are, each row can be written as soon as it's been
+        # converted. Otherwise every row needs to be converted to find the
+        # longest before anything is written. When streaming, that would defeat
+        # the point, so rows are written as-is. Parquet files pad short rows
+        # with nulls themselves.
+        if output_format in BINARY_FORMATS:
+            pass
+        elif columns is not None:
+            rows = fill_rows(rows, columns)
+        elif pad and not stream:
+            rows = pad_rows(rows)
+
+        # Output the table to stdout, or to a file named after the table,
+        # keeping a copy for the result cache if there is one.
+        with open_output(output, output_template, n, output_format) as fh:
+            if result_cache is not None:
+                fh = CapturingFile(fh, result_cache.max_size)
+                captured.append(fh)
+            write_table(rows, fh, output_format, delimiter)
 
-    # Acceptable inputs are a single table element, or a collection of one or
-    # more tr elements. Anything else is considered bad input.
-    if len(elements) == 0:
-        raise click.UsageError("value matched no elements")
-    elif len(elements) == 1 and elements[0].tag == "table":
-        # The convoluted XPath expression below is to stop nested tables being
-        # flattened out in the output. We only want the table rows that are
-        # direct children of the selected table to be output as rows. Any
-        # tables within the selected table should be output as text within a
-        # row cell, not added as distinct, top-level rows.
-        elements = elements[0].xpath("./tr|./thead/tr|./tbody/tr|./tfoot/tr")
-    elif len(elements) == 1 and elements[0].tag != "tr":
-        raise click.UsageError(f"select value matched {elements[0].tag} element")
-    elif any(el.tag != "tr" for el in elements):
+    if result_cache is not None:
+        values = [fh.value for fh in captured]
+        # Output too large to fit in the cache isn't cached.
+        if all(value is not None for value in values):
+            result_cache.set(
+                result_cache_key,
+                b"".join(values),  # type: ignore[arg-type]
+                {"lengths": [len(value) for value in values]},  # type: ignore[arg-type]
+            )
+        result_cache.evict()
+
+
+def make_fetcher(cache_dir: str, max_size: int, max_age: int) -> "Fetcher":
+    """
+    Return a fetcher that caches responses in ``cache_dir``, keeping no
+    more than ``max_size`` megabytes of responses for no longer than
+    ``max_age`` days.
+    """
+    from .cache import DiskCache
+    from .fetch import Fetcher
+
+    cache = DiskCache(
+        cache_dir, max_size=max_size * 1024 * 1024, max_age=max_age * 24 * 60 * 60
+    )
+    return Fetcher(retries=0, cache=cache)
+
+
+def check_output_template(output_template: str | None, num_tables: int):
+    """
+    Check that ``output_template`` names a different file for each of
+    ``num_tables`` tables.
+    """
+    if (
+        output_template is not None
+        and num_tables > 1
+        and output_template.format(n=1) == output_template.format(n=2)
+    ):
         raise click.UsageError(
-            "select value must match one 'table' element or one or more 'tr' elements"
+            "--output-template must contain '{n}' when converting more than one table"
         )
 
-    # Use the set of default null values if the user didn't specify any. When a
-    # cell value matches one of these it will be output as an empty cell in the
-    # CSV.
-    null_value = null_value or DEFAULT_NULL_VALUES
-    # If the user didn't specify at least one currency symbol, use the default
-    # set.
-    currency_symbol = currency_symbol or DEFAULT_CURRENCY_SYMBOLS
-
-    rows: list[Row] = []
-    num_columns = 0  # Holds the cell length of the longest row.
-    for tr in elements:
-        row: Row = []
-        cell: Cell = None
-        # Loop through all th and td elements and output them as cells. Since
-        # CSV doesn't have any concept of headers or data cells we don't need
-        # to treat them differently.
-        for cell_element in tr.xpath("./th|./td"):
-            # Strip whitespace, convert null values to None, and append all the
-            # text within the cell element and its children to the row,
-            cell = " ".join(cell_element.text_content().split())
-            if cell in null_value:
-                cell = None
-            elif convert_numbers:
-                with contextlib.suppress(ValueError):
-                    # ValueError means the string isn't numeric, so leave it as-is.
-                    cell = numberise(
-                        cell, group_symbol, decimal_symbol, currency_symbol
-                    )
-            # Parse the colspan attribute. A cell's value is used as an
-            # individual cell in the output row once for every column it's
-            # meant to span. If ``colspan=4`` then the cell's value will be
-            # output four times in the row. Regarding the value of the colspan
-            # attribute, the HTML5 spec is followed here, with only integer
-            # values greater than zero allowed.
-            try:
-                col_span = cell_element.attrib["colspan"]
-                if col_span.isdigit():
-                    col_span = int(col_span)
-                else:
-                    # Ignore negative values and non-integers, as per HTML5.
-                    raise ValueError(f"invalid integer {col_span}")
-                # Zero as a value becomes 1, as per HTML5 spec.
-                if col_span == 0:
-                    col_span = 1
-            except (KeyError, TypeError, ValueError):
-                # HTML 5 says (sensibly) that the default value is 1.
-                col_span = 1
-            row += [cell] * col_span
-        if any(row):
-            if len(row) > num_columns:
-                # This is the row with the largest number of cells so far, so
-                # store the number of columns it contains. This is used when
-                # outputting the CSV to stdout to ensure all rows are the same
-                # length.
-                num_columns = len(row)
-            # Only include a row in the output if it has at least one non-empty
-            # cell.
-            rows.append(row)
-
-    # Output the CSV to stdout.
-    out = csv.writer(output, delimiter=delimiter)
-    for row in rows:
-        # Extra empty cells are added to the row as required, to ensure that
-        # all rows have the same number of fields (as required by the closest
-        # thing CSV has to a specification, RFC 4180).
-        out.writerow(row + ([""] * (num_columns - len(row))))
+
+@contextlib.contextmanager
+def open_output(
+    output: IO[Any], output_template: str | None, n: int, output_format: str
+) -> Iterator[IO[Any]]:
+    """
+    Return the file to write the ``n``th table to: ``output``, or the
+    file named by ``output_template`` if given. Binary formats are
+    written to the binary buffer underlying the text file opened for
+    ``--output``.
+    """
+    binary = output_format in BINARY_FORMATS
+    if output_template is None:
+        yield output.buffer if binary else output
+    else:
+        with click.open_file(
+            output_template.format(n=n), "wb" if binary else "w"
+        ) as fh:
+            yield fh
+
+
+def write_table(
+    rows: Iterable[Row], output: IO[Any], output_format: str, delimiter: str
+):
+    """
+    Write ``rows`` to the file object ``output`` in ``output_format``.
+    """
+    write = WRITERS[output_format]
+    if output_format == "csv":
+        write = functools.partial(write, delimiter=delimiter)
+    try:
+        if stats.enabled():
+            with stats.measure_output(rows, output) as (rows, output):
+                write(rows, output)
+        else:
+            write(rows, output)
+    except ValueError as err:
+        # When streaming, not finding a matching table is only discovered once
+        # the whole document has been parsed.
+        raise click.UsageError(str(err))
+    except LxmlError:
+        raise click.UsageError("could not parse HTML")
+
+
+def report(collector: stats.Collector):
+    """
+    Stop collecting measurements, and write them to stderr as JSON.
+    """
+    stats.remove_hook(collector)
+    click.echo(json.dumps(collector.report()), err=True)
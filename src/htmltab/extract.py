@@ -0,0 +1,428 @@
+"""
+Library interface to HTMLTab. Parse an HTML document, select a table
+within it, and convert the table's rows into lists of cell values,
+without going through the command-line interface.
+
+    >>> from htmltab import extract_table
+    >>> html = "<table><tr><td>Total</td><td>1,000</td></tr></table>"
+    >>> list(extract_table(html))
+    [['Total', Decimal('1000')]]
+"""
+
+import contextlib
+import datetime
+import io
+import math
+import os
+from decimal import Decimal
+from typing import IO, Any, Iterable, Iterator
+
+import lxml.etree
+import lxml.html
+
+from . import stats
+from .store import RowStore
+from .stream import iter_rows
+from .utils import (
+    parse_html,
+    parse_html_file,
+    select_elements,
+    shared_number_parser,
+)
+
+DEFAULT_NULL_VALUES = ["NA", "N/A", ".", "-"]
+DEFAULT_CURRENCY_SYMBOLS = ["$", "¥", "£", "€"]
+
+type Cell = None | Decimal | str | datetime.date
+type Row = list[Cell]
+type Source = str | bytes | os.PathLike[str] | IO[Any] | lxml.html.HtmlElement
+
+# The convoluted XPath expression below is to stop nested tables being
+# flattened out in the output. We only want the table rows that are direct
+# children of the selected table to be output as rows. Any tables within the
+# selected table should be output as text within a row cell, not added as
+# distinct, top-level rows.
+TABLE_ROWS = lxml.etree.XPath("./tr|./thead/tr|./tbody/tr|./tfoot/tr")
+ROW_CELLS = lxml.etree.XPath("./th|./td")
+# All the text within an element and its children, as returned by
+# ``text_content()``, but as a plain string rather than a "smart" string
+# that keeps a reference to the element.
+TEXT_CONTENT = lxml.etree.XPath("string()", smart_strings=False)
+
+# HTML5 caps the number of rows a cell can span.
+MAX_ROW_SPAN = 65534
+
+
+def extract_table(
+    source: Source,
+    select: str = "1",
+    *,
+    null_values: list[str] | None = None,
+    convert_numbers: bool = True,
+    group_symbol: str = ",",
+    decimal_symbol: str = ".",
+    currency_symbols: list[str] | None = None,
+    stream: bool = False,
+    encoding: str | None = None,
+    jobs: int | None = 1,
+) -> Iterator[Row]:
+    """
+    Select a table within an HTML document and return an iterator over
+    its rows. Rows are converted lazily, so a caller that only needs
+    the first few rows can stop iterating early. Rows that contain no
+    non-empty cells are skipped, and rows aren't padded to the same
+    length.
+
+    The document is parsed and the table selected before this function
+    returns, so any errors in doing so are raised immediately. When
+    ``stream`` is true the document is instead parsed incrementally as
+    rows are requested, and errors may be raised during iteration.
+
+    Args:
+        source: HTML document as a string or bytes, the path to a local
+            HTML file, a file object, or an already-parsed document.
+        select: Integer index, CSS selector, or XPath expression that
+            determines the table to convert.
+        null_values: Case-sensitive values to convert to ``None``.
+            Defaults to :data:`DEFAULT_NULL_VALUES`.
+        convert_numbers: Convert number-like strings into
+            :class:`decimal.Decimal` objects.
+        group_symbol: Symbol used to group digits in numbers (e.g. the
+            ',' in '1,000.00').
+        decimal_symbol: Symbol used to separate integer from fraction in
+            numbers (e.g. the '.' in '1,000.00').
+        currency_symbols: Currency symbols to remove when converting
+            numbers. Defaults to :data:`DEFAULT_CURRENCY_SYMBOLS`.
+        stream: Parse the document incrementally, without building a
+            tree for the whole document. ``select`` must then be an
+            integer index or a simple CSS selector.
+        encoding: Character encoding of the document, if it's bytes or a
+            binary file. A byte order mark at the start of the document
+            takes precedence. If not given, the encoding is detected.
+        jobs: Number of worker processes to convert the rows in, for
+            very large tables. ``None`` uses one process per CPU. The
+            rows are the same as when they're converted in this process.
+
+    Returns:
+        Iterator over the table's rows.
+
+    Raises:
+        :class:`~htmltab.utils.InvalidSelectorError`: ``select`` is not
+            a valid index, CSS selector, or XPath expression
+        :class:`ValueError`: the document can't be decoded, or
+            ``select`` doesn't match a table or table rows
+        :class:`lxml.etree.LxmlError`: the document can't be parsed
+    """
+    if stream:
+        elements = iter_rows(open_source(source), select, encoding)
+    else:
+        elements = select_rows(_parse(source, encoding), select)
+    rows = _convert_rows(
+        elements,
+        jobs,
+        null_values or DEFAULT_NULL_VALUES,
+        convert_numbers,
+        group_symbol,
+        decimal_symbol,
+        currency_symbols or DEFAULT_CURRENCY_SYMBOLS,
+    )
+    # Rows are only counted and timed if someone's listening.
+    return stats.measure_rows(rows) if stats.enabled() else rows
+
+
+def extract_tables(
+    source: Source,
+    selects: Iterable[str] | None = None,
+    *,
+    null_values: list[str] | None = None,
+    convert_numbers: bool = True,
+    group_symbol: str = ",",
+    decimal_symbol: str = ".",
+    currency_symbols: list[str] | None = None,
+    encoding: str | None = None,
+    jobs: int | None = 1,
+) -> list[Iterator[Row]]:
+    """
+    Select multiple tables within an HTML document, and return a list
+    containing an iterator over the rows of each table. The document is
+    only parsed once, however many tables are selected.
+
+    If ``selects`` is ``None``, every table in the document is selected,
+    in document order. Otherwise each value in ``selects`` must select a
+    single table, as for :func:`extract_table`. All other arguments are
+    the same as for :func:`extract_table`.
+
+    Raises:
+        :class:`~htmltab.utils.InvalidSelectorError`: a value in
+            ``selects`` is not a valid index, CSS selector, or XPath
+            expression
+        :class:`ValueError`: the document can't be decoded, it contains
+            no tables, or a value in ``selects`` doesn't match a table or
+            table rows
+        :class:`lxml.etree.LxmlError`: the document can't be parsed
+    """
+    doc = _parse(source, encoding)
+    if selects is None:
+        tables = [table_rows(table) for table in doc.xpath("//table")]
+        if not tables:
+            raise ValueError("document contains no tables")
+    else:
+        tables = [select_rows(doc, select) for select in selects]
+    converted = [
+        _convert_rows(
+            elements,
+            jobs,
+            null_values or DEFAULT_NULL_VALUES,
+            convert_numbers,
+            group_symbol,
+            decimal_symbol,
+            currency_symbols or DEFAULT_CURRENCY_SYMBOLS,
+        )
+        for elements in tables
+    ]
+    if stats.enabled():
+        return [stats.measure_rows(rows) for rows in converted]
+    return converted
+
+
+def select_rows(doc: lxml.html.HtmlElement, select: str) -> list[lxml.html.HtmlElement]:
+    """
+    Return the ``tr`` elements within ``doc`` that make up the table
+    matched by ``select``. The selector must match either a single
+    ``table`` element or one or more ``tr`` elements.
+
+    Raises:
+        :class:`~htmltab.utils.InvalidSelectorError`: ``select`` is not
+            a valid index, CSS selector, or XPath expression
+        :class:`ValueError`: ``select`` matched no elements, or elements
+            other than a table or table rows
+    """
+    elements = select_elements(doc, select)
+
+    # Acceptable inputs are a single table element, or a collection of one or
+    # more tr elements. Anything else is considered bad input.
+    if len(elements) == 0:
+        raise ValueError("value matched no elements")
+    elif len(elements) == 1 and elements[0].tag == "table":
+        return table_rows(elements[0])
+    elif len(elements) == 1 and elements[0].tag != "tr":
+        raise ValueError(f"select value matched {elements[0].tag} element")
+    elif any(el.tag != "tr" for el in elements):
+        raise ValueError(
+            "select value must match one 'table' element or one or more 'tr' elements"
+        )
+    return elements
+
+
+def table_rows(table: lxml.html.HtmlElement) -> list[lxml.html.HtmlElement]:
+    """
+    Return the ``tr`` elements that belong to ``table``.
+    """
+    return TABLE_ROWS(table)
+
+
+def convert_rows(
+    elements: Iterable[lxml.html.HtmlElement],
+    null_values: list[str],
+    convert_numbers: bool,
+    group_symbol: str,
+    decimal_symbol: str,
+    currency_symbols: list[str],
+) -> Iterator[Row]:
+    """
+    Convert each ``tr`` element in ``elements`` to a row of cells, and
+    yield the rows that contain at least one non-empty cell.
+
+    A cell that spans multiple rows is repeated in the same columns of
+    each row it spans. Only the columns of cells spanning rows are kept
+    between rows, so rows are converted one at a time however large the
+    table is.
+    """
+    parse_number = shared_number_parser(
+        group_symbol, decimal_symbol, tuple(currency_symbols)
+    )
+    # For each column, the value of the cell spanning down into it from a row
+    # above, and the number of rows (including the current one) it spans. The
+    # lists are trimmed so that the last column always has a cell spanning
+    # into it.
+    span_values: list[Cell] = []
+    span_rows: list[float] = []
+    row_group = None
+    for tr in elements:
+        # Cells can't span rows beyond the end of their row group (thead,
+        # tbody, or tfoot).
+        if tr.getparent() is not row_group:
+            row_group = tr.getparent()
+            span_values.clear()
+            span_rows.clear()
+        row: Row = []
+        cell: Cell = None
+        # Loop through all th and td elements and output them as cells. Since
+        # CSV doesn't have any concept of headers or data cells we don't need
+        # to treat them differently.
+        for cell_element in ROW_CELLS(tr):
+            # Skip over the columns taken by cells spanning down from above.
+            while len(row) < len(span_rows) and span_rows[len(row)]:
+                row.append(span_values[len(row)])
+            # Strip whitespace, convert null values to None, and append all the
+            # text within the cell element and its children to the row. Most
+            # cells have no children, so their text can be used as-is.
+            if len(cell_element):
+                cell = " ".join(TEXT_CONTENT(cell_element).split())
+            else:
+                cell = " ".join((cell_element.text or "").split())
+            if cell in null_values:
+                cell = None
+            elif convert_numbers:
+                # None means the string isn't numeric, so leave it as-is.
+                number = parse_number(cell)
+                if number is not None:
+                    cell = number
+            # A cell's value is used as an individual cell in the output row
+            # once for every column it's meant to span. If ``colspan=4`` then
+            # the cell's value will be output four times in the row.
+            col_span = cell_col_span(cell_element)
+            row_span = cell_row_span(cell_element)
+            if row_span != 1:
+                column = len(row)
+                if len(span_rows) < column + col_span:
+                    span_values += [None] * (column + col_span - len(span_rows))
+                    span_rows += [0] * (column + col_span - len(span_rows))
+                for i in range(column, column + col_span):
+                    span_values[i] = cell
+                    span_rows[i] = row_span
+            row += [cell] * col_span
+        if span_rows:
+            # Fill any columns after the row's own cells that are taken by cells
+            # spanning down from above, leaving gaps empty.
+            for i in range(len(row), len(span_rows)):
+                row.append(span_values[i] if span_rows[i] else "")
+            span_rows[:] = [rows - 1 if rows else 0 for rows in span_rows]
+            while span_rows and not span_rows[-1]:
+                span_rows.pop()
+                span_values.pop()
+        if any(row):
+            # Only include a row in the output if it has at least one non-empty
+            # cell.
+            yield row
+
+
+def cell_col_span(cell_element: lxml.html.HtmlElement) -> int:
+    """
+    Return the number of columns spanned by a cell, according to its
+    colspan attribute. Regarding the value of the colspan attribute, the
+    HTML5 spec is followed here, with only integer values greater than
+    zero allowed.
+    """
+    try:
+        col_span = cell_element.attrib["colspan"]
+        if col_span.isdigit():
+            col_span = int(col_span)
+        else:
+            # Ignore negative values and non-integers, as per HTML5.
+            raise ValueError(f"invalid integer {col_span}")
+        # Zero as a value becomes 1, as per HTML5 spec.
+        if col_span == 0:
+            col_span = 1
+    except (KeyError, TypeError, ValueError):
+        # HTML 5 says (sensibly) that the default value is 1.
+        col_span = 1
+    return col_span
+
+
+def cell_row_span(cell_element: lxml.html.HtmlElement) -> float:
+    """
+    Return the number of rows spanned by a cell, according to its rowspan
+    attribute. As per HTML5, a cell with ``rowspan=0`` spans every row to
+    the end of its row group, which is returned as infinity.
+    """
+    row_span = cell_element.get("rowspan")
+    # Ignore negative values and non-integers, and use the default value of
+    # 1, as per HTML5.
+    if row_span is None or not row_span.isdigit():
+        return 1
+    try:
+        row_span = int(row_span)
+    except ValueError:
+        return 1
+    if row_span == 0:
+        return math.inf
+    return min(row_span, MAX_ROW_SPAN)
+
+
+def _convert_rows(
+    elements: Iterable[lxml.html.HtmlElement],
+    jobs: int | None,
+    null_values: list[str],
+    convert_numbers: bool,
+    group_symbol: str,
+    decimal_symbol: str,
+    currency_symbols: list[str],
+) -> Iterator[Row]:
+    """
+    Convert ``elements`` as :func:`convert_rows` does, in ``jobs``
+    worker processes unless ``jobs`` is 1.
+    """
+    options = (
+        null_values,
+        convert_numbers,
+        group_symbol,
+        decimal_symbol,
+        currency_symbols,
+    )
+    if jobs == 1:
+        return convert_rows(elements, *options)
+    # Worker processes are only needed for very large tables, so the modules
+    # that start them are only imported when they're used.
+    from .parallel import convert_rows_parallel
+
+    return convert_rows_parallel(elements, jobs, *options)
+
+
+def pad_rows(rows: Iterable[Row]) -> RowStore:
+    """
+    Return ``rows`` stored in a :class:`~htmltab.store.RowStore`, which
+    adds empty cells to the end of each row as it's read, as required so
+    that every row has the same number of cells as the longest row.
+    Every row has to be read to find the longest, and the store holds
+    them in much less memory than a list of lists.
+    """
+    return RowStore(rows)
+
+
+def fill_rows(rows: Iterable[Row], num_columns: int) -> Iterator[Row]:
+    """
+    Yield each row in ``rows``, with empty cells added to the end of the
+    row as required so that it has at least ``num_columns`` cells. Unlike
+    :func:`pad_rows`, rows are yielded as soon as they're available.
+    """
+    for row in rows:
+        if len(row) < num_columns:
+            row = row + [""] * (num_columns - len(row))
+        yield row
+
+
+def _parse(source: Source, encoding: str | None) -> lxml.html.HtmlElement:
+    """
+    Parse ``source`` as HTML, unless it's already been parsed.
+    """
+    if isinstance(source, lxml.html.HtmlElement):
+        return source
+    elif isinstance(source, (str, bytes)):
+        return parse_html(source, encoding)
+    with contextlib.closing(open_source(source)) as html_file:
+        return parse_html_file(html_file, encoding)
+
+
+def open_source(source: Source) -> IO[Any]:
+    """
+    Return a file object for ``source``, which can be a string or bytes
+    containing HTML, a path to a local file, or a file object.
+    """
+    if isinstance(source, str):
+        return io.StringIO(source)
+    elif isinstance(source, bytes):
+        return io.BytesIO(source)
+    elif isinstance(source, os.PathLike):
+        return open(source, "rb")
+    return source
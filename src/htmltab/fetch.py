@@ -0,0 +1,230 @@
+"""
+Fetch HTML documents over HTTP/HTTPS. Many URLs can be requested
+concurrently over a shared, connection-pooled session, so requests to
+the same host reuse connections instead of each paying for a new TCP
+connection and TLS handshake. Responses can be cached on disk and
+revalidated with conditional requests, so unchanged documents aren't
+downloaded again.
+"""
+
+import re
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, Iterator
+
+import requests
+import requests.adapters
+import requests.exceptions
+import requests.structures
+import requests.utils
+from urllib3.util.retry import Retry
+
+from . import stats
+from .cache import DiskCache
+
+USER_AGENT = "HTMLTab (+https://github.com/flother/htmltab)"
+
+# Responses with these status codes are retried, as the server may well
+# respond successfully if asked again.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Response headers stored alongside cached responses.
+CACHED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+class Fetcher:
+    """
+    Fetch URLs using a shared :class:`requests.Session`. Connections are
+    kept alive and reused, failed requests are retried with exponential
+    backoff, and no more than ``per_host`` requests are made to any one
+    host at the same time.
+
+    If a ``cache`` is given, responses that include an ``ETag`` or
+    ``Last-Modified`` header are stored in it. The next time the same URL
+    is requested, the request is made conditional on the document having
+    changed. If the server responds with ``304 Not Modified``, the
+    cached response is returned instead.
+
+    Args:
+        concurrency: Maximum number of requests made at the same time by
+            :meth:`fetch_all`.
+        per_host: Maximum number of requests made to a single host at
+            the same time.
+        timeout: Number of seconds to wait for the server to respond.
+        retries: Number of times to retry a request that failed because
+            of a connection error or a 429/5xx response.
+        backoff: Backoff factor, in seconds, between retries. The delay
+            doubles after each retry.
+        cache: Cache to store responses in.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 8,
+        per_host: int = 4,
+        timeout: float = 10,
+        retries: int = 3,
+        backoff: float = 0.5,
+        cache: DiskCache | None = None,
+    ):
+        self.cache = cache
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = requests.adapters.HTTPAdapter(
+            pool_maxsize=per_host,
+            max_retries=Retry(
+                total=retries,
+                backoff_factor=backoff,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=["GET"],
+                raise_on_status=False,
+            ),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._host_limits: dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> requests.Response:
+        """
+        Request ``url`` using the GET method and return the response.
+
+        Raises:
+            :class:`requests.exceptions.RequestException`: the request
+                failed, or the server responded with a 4xx or 5xx status
+        """
+        with stats.timed("fetch") as metrics:
+            response = self._get(url)
+            metrics["bytes_in"] = len(response.content)
+        return response
+
+    def _get(self, url: str) -> requests.Response:
+        cached = self.cache.get(url) if self.cache is not None else None
+        headers = {}
+        if cached is not None:
+            cached_headers = cached[1]["headers"]
+            if "ETag" in cached_headers:
+                headers["If-None-Match"] = cached_headers["ETag"]
+            if "Last-Modified" in cached_headers:
+                headers["If-Modified-Since"] = cached_headers["Last-Modified"]
+        with self._host_limit(url):
+            response = self.session.get(url, timeout=self.timeout, headers=headers)
+        if cached is not None and response.status_code == 304:
+            return self._cached_response(url, response, *cached)
+        response.raise_for_status()
+        if self.cache is not None and (
+            "ETag" in response.headers or "Last-Modified" in response.headers
+        ):
+            self.cache.set(
+                url, response.content, {"headers": _cached_headers(response)}
+            )
+        return response
+
+    def fetch_all(
+        self, urls: Iterable[str]
+    ) -> Iterator[tuple[str, requests.Response | requests.RequestException]]:
+        """
+        Request each URL in ``urls`` concurrently, and yield each URL
+        along with either its response or the exception raised when
+        requesting it. Results are yielded as soon as each request
+        completes, not necessarily in the order of ``urls``.
+        """
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {executor.submit(self.get, url): url for url in urls}
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result()
+                except requests.RequestException as err:
+                    yield futures[future], err
+
+    def close(self):
+        """
+        Close the session and any connections it holds open, and evict
+        old entries from the cache.
+        """
+        self.session.close()
+        if self.cache is not None:
+            self.cache.evict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _cached_response(
+        self,
+        url: str,
+        not_modified: requests.Response,
+        content: bytes,
+        metadata: dict,
+    ) -> requests.Response:
+        """
+        Return a response built from a cached document, after the server
+        responded to a conditional request with ``304 Not Modified``.
+        """
+        # A 304 response can carry updated validators, which should be used
+        # next time.
+        headers = metadata["headers"]
+        updated = _cached_headers(not_modified)
+        updated.pop("Content-Type", None)
+        if updated:
+            headers.update(updated)
+            self.cache.update(url, metadata)
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = "OK"
+        response.url = url
+        response.headers = requests.structures.CaseInsensitiveDict(headers)
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response._content = content
+        return response
+
+    def _host_limit(self, url: str) -> threading.BoundedSemaphore:
+        """
+        Return the semaphore that limits concurrent requests to the host
+        of ``url``.
+        """
+        host = urllib.parse.urlparse(url).netloc
+        with self._lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_limits[host]
+
+
+def _cached_headers(response: requests.Response) -> dict[str, str]:
+    return {
+        name: response.headers[name]
+        for name in CACHED_HEADERS
+        if name in response.headers
+    }
+
+
+def response_charset(response: requests.Response) -> str | None:
+    """
+    Return the character encoding declared in the ``Content-Type`` header
+    of ``response``, or ``None`` if there isn't one.
+    """
+    content_type = response.headers.get("Content-Type", "")
+    match = re.search(r"charset\s*=\s*[\"']?([\w.:-]+)", content_type, re.IGNORECASE)
+    return match[1] if match else None
+
+
+def describe_error(err: requests.RequestException, url: str) -> str:
+    """
+    Return a short, human-readable description of an error raised when
+    requesting ``url``.
+    """
+    if isinstance(err, requests.exceptions.ConnectionError):
+        return f"Connection error ({url})"
+    elif isinstance(err, requests.exceptions.Timeout):
+        return f"Time out ({url})"
+    elif isinstance(err, requests.exceptions.TooManyRedirects):
+        return f"Too many redirects ({url})"
+    elif isinstance(err, requests.exceptions.HTTPError):
+        return f"HTTP {err.response.status_code} {err.response.reason} ({url})"
+    return f"Request error ({url})"
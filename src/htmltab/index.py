@@ -0,0 +1,185 @@
+"""
+List every table in an HTML document, along with enough about each one
+to decide which to convert and how to select it, without converting any
+of them. The document is parsed once, incrementally, so listing the
+tables in a large document is far quicker than converting each in turn
+to find the right one.
+"""
+
+import contextlib
+from typing import Any, Iterable, Iterator
+
+import lxml.etree
+import lxml.html
+
+from .extract import (
+    ROW_CELLS,
+    TEXT_CONTENT,
+    Source,
+    cell_col_span,
+    cell_row_span,
+    open_source,
+)
+from .stream import SIMPLE_SELECTOR, discard_element, is_row_of, parse_events
+
+type TableInfo = dict[str, Any]
+
+
+def list_tables(source: Source, encoding: str | None = None) -> Iterator[TableInfo]:
+    """
+    Yield a dictionary describing each ``table`` element in an HTML
+    document, in document order. Each dictionary contains:
+
+    ``index``
+        One-based index of the table within the document, which can be
+        used to select it.
+    ``id``, ``class``
+        The table's ``id`` attribute, and a list of its class names.
+    ``css``
+        CSS selector that selects the table by its id (e.g.
+        ``table#data``), or ``None`` if the table doesn't have one.
+    ``xpath``
+        XPath expression that selects the table by its index.
+    ``depth``
+        Number of tables the table is nested inside.
+    ``caption``
+        Text of the table's ``caption`` element, or ``None``.
+    ``rows``
+        Number of rows in the table, not counting rows in nested tables.
+    ``columns``
+        Number of columns in the widest row, once cells spanning more
+        than one column or row have been taken into account.
+    ``header``
+        Text of each cell in the first row that isn't empty, repeated
+        for each column the cell spans.
+
+    The document is parsed incrementally, and each table is yielded once
+    its end tag has been parsed (tables nested inside it are yielded
+    after it). Arguments are as for :func:`~htmltab.extract.extract_table`.
+
+    Raises:
+        :class:`lxml.etree.LxmlError`: the document can't be parsed
+    """
+    if isinstance(source, lxml.html.HtmlElement):
+        # The tree belongs to the caller, so nothing is cleared from it.
+        yield from _list_tables(
+            lxml.etree.iterwalk(source, events=("start", "end")), discard=False
+        )
+    else:
+        with contextlib.closing(open_source(source)) as html_file:
+            yield from _list_tables(parse_events(html_file, encoding), discard=True)
+
+
+def _list_tables(
+    events: Iterable[tuple[str, Any]], discard: bool
+) -> Iterator[TableInfo]:
+    # Tables whose end tag hasn't been parsed yet, outermost first.
+    open_tables: list[_Table] = []
+    # Tables that have ended but are waiting on a table before them (the
+    # table they're nested in) to end, keyed by index.
+    finished: dict[int, TableInfo] = {}
+    num_tables = 0
+    next_index = 1
+    for event, element in events:
+        if event == "start":
+            if element.tag == "table":
+                num_tables += 1
+                open_tables.append(_Table(element, num_tables, len(open_tables)))
+            continue
+        if not open_tables:
+            # Everything parsed so far lies outside any table.
+            if discard:
+                discard_element(element)
+            continue
+        table = open_tables[-1]
+        if element is table.element:
+            open_tables.pop()
+            finished[table.index] = table.info()
+            while next_index in finished:
+                yield finished.pop(next_index)
+                next_index += 1
+        elif element.tag == "tr" and is_row_of(element, table.element):
+            table.add_row(element)
+            # Rows of nested tables are part of a cell of the table they're
+            # nested in, and are cleared along with the row that cell is in.
+            if discard and len(open_tables) == 1:
+                discard_element(element)
+        elif element.tag == "caption" and element.getparent() is table.element:
+            table.caption = _text(element)
+
+
+class _Table:
+    """
+    What's known about a table whose end tag hasn't been parsed yet.
+    Rows are measured as they're parsed, so they can be cleared from the
+    tree straight away.
+    """
+
+    def __init__(self, element: lxml.html.HtmlElement, index: int, depth: int):
+        self.element = element
+        self.index = index
+        self.depth = depth
+        self.caption: str | None = None
+        self.num_rows = 0
+        self.num_columns = 0
+        self.header: list[str] | None = None
+        # For each column, the number of rows (including the current one)
+        # spanned by the cell spanning down into it, as in ``convert_rows``.
+        self._span_rows: list[float] = []
+        self._row_group = None
+
+    def add_row(self, tr: lxml.html.HtmlElement):
+        if tr.getparent() is not self._row_group:
+            self._row_group = tr.getparent()
+            self._span_rows.clear()
+        span_rows = self._span_rows
+        width = 0
+        cells: list[str] = []
+        for cell_element in ROW_CELLS(tr):
+            while width < len(span_rows) and span_rows[width]:
+                width += 1
+            # Most cells have no attributes, and so span one column and row.
+            if cell_element.attrib:
+                col_span = cell_col_span(cell_element)
+                row_span = cell_row_span(cell_element)
+            else:
+                col_span = row_span = 1
+            if row_span != 1:
+                if len(span_rows) < width + col_span:
+                    span_rows += [0] * (width + col_span - len(span_rows))
+                for i in range(width, width + col_span):
+                    span_rows[i] = row_span
+            width += col_span
+            # Only the text of the cells in the header row is needed.
+            if self.header is None:
+                cells += [_text(cell_element)] * col_span
+        self.num_rows += 1
+        self.num_columns = max(self.num_columns, width, len(span_rows))
+        if self.header is None and any(cells):
+            self.header = cells
+        span_rows[:] = [rows - 1 if rows else 0 for rows in span_rows]
+        while span_rows and not span_rows[-1]:
+            span_rows.pop()
+
+    def info(self) -> TableInfo:
+        element_id = self.element.get("id")
+        return {
+            "index": self.index,
+            "id": element_id,
+            "class": self.element.get("class", "").split(),
+            "css": (
+                f"table#{element_id}"
+                if element_id and SIMPLE_SELECTOR.match(f"#{element_id}")
+                else None
+            ),
+            "xpath": f"(//table)[{self.index}]",
+            "depth": self.depth,
+            "caption": self.caption,
+            "rows": self.num_rows,
+            "columns": self.num_columns,
+            "header": self.header or [],
+        }
+
+
+def _text(element: lxml.html.HtmlElement) -> str:
+    return " ".join(TEXT_CONTENT(element).split())
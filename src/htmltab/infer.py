@@ -0,0 +1,181 @@
+"""
+Infer the type of each column in a table, and convert every cell in the
+column to that type. Unlike converting number-like strings cell by cell,
+a column's type is decided once, from a sample of its rows, so the cells
+in a column all have the same type and each cell is converted with a
+single, type-specific converter.
+"""
+
+import datetime
+import itertools
+import re
+from decimal import Decimal
+from typing import Callable, Iterable, Iterator
+
+from .extract import Cell, Row
+
+# Number of rows, after the header row, used to infer the type of each column.
+SAMPLE_SIZE = 1000
+
+# Column types, in the order they're tried. A column is given the first type
+# that every non-empty cell in the sample matches.
+COLUMN_TYPES = ("integer", "decimal", "percent", "currency", "date", "text")
+
+DATE = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2}")
+
+type Converter = Callable[[str], Cell]
+
+
+def infer_types(
+    rows: Iterable[Row],
+    group_symbol: str = ",",
+    decimal_symbol: str = ".",
+    currency_symbols: list[str] | None = None,
+    sample_size: int = SAMPLE_SIZE,
+) -> Iterator[Row]:
+    """
+    Yield each row in ``rows``, with the cells in each column converted
+    to the column's type. The first row is treated as a header and
+    yielded unchanged, and the type of each column is inferred from the
+    next ``sample_size`` rows. Only those rows are held in memory, so
+    the rest of the rows are converted as they're read.
+
+    Columns can be integers, decimals, percentages, or amounts of
+    currency, which are converted to :class:`decimal.Decimal` objects;
+    ISO 8601 dates (e.g. '2024-01-31'), which are converted to
+    :class:`datetime.date` objects; or text, which is left unchanged.
+    Null values and empty cells are left unchanged in every column, as
+    are cells after the sample that don't match their column's type.
+
+    Args:
+        rows: Rows of strings and null values, as returned by
+            :func:`~htmltab.extract_table` with ``convert_numbers``
+            turned off.
+        group_symbol: Symbol used to group digits in numbers (e.g. the
+            ',' in '1,000.00').
+        decimal_symbol: Symbol used to separate integer from fraction in
+            numbers (e.g. the '.' in '1,000.00').
+        currency_symbols: Currency symbols that may precede or follow
+            amounts of currency.
+        sample_size: Number of rows used to infer the column types.
+    """
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        return
+    yield header
+    sample = list(itertools.islice(rows, sample_size))
+    converters = column_converters(
+        sample, group_symbol, decimal_symbol, currency_symbols or []
+    )
+    for row in itertools.chain(sample, rows):
+        yield _convert_row(row, converters)
+
+
+def column_converters(
+    rows: list[Row],
+    group_symbol: str,
+    decimal_symbol: str,
+    currency_symbols: list[str],
+) -> list[Converter | None]:
+    """
+    Infer the type of each column in ``rows``, and return a function for
+    each column that converts a cell to that type. Text columns need no
+    conversion, and have ``None`` instead.
+    """
+    patterns = _patterns(group_symbol, decimal_symbol, currency_symbols)
+    num_columns = max(map(len, rows), default=0)
+    converters: list[Converter | None] = []
+    for i in range(num_columns):
+        values = [
+            row[i]
+            for row in rows
+            if i < len(row) and isinstance(row[i], str) and row[i]
+        ]
+        column_type = _column_type(values, patterns)
+        if column_type == "text":
+            converters.append(None)
+        elif column_type == "date":
+            converters.append(_date_converter)
+        else:
+            converters.append(
+                _number_converter(patterns[column_type], group_symbol, decimal_symbol)
+            )
+    return converters
+
+
+def _column_type(values: list[str], patterns: dict[str, re.Pattern[str]]) -> str:
+    if not values:
+        return "text"
+    for column_type in COLUMN_TYPES[:-1]:
+        if all(map(patterns[column_type].fullmatch, values)):
+            return column_type
+    return "text"
+
+
+def _patterns(
+    group_symbol: str, decimal_symbol: str, currency_symbols: list[str]
+) -> dict[str, re.Pattern[str]]:
+    """
+    Return a regular expression that matches the cells of each column
+    type. Numbers are captured by the ``number`` (or ``number2``) group
+    and their signs by the ``sign`` (or ``sign2``) group.
+    """
+    group = re.escape(group_symbol)
+    decimal = re.escape(decimal_symbol)
+    integer = rf"[0-9]{{1,3}}(?:{group}[0-9]{{3}})+|[0-9]+"
+    number = rf"(?:{integer})(?:{decimal}[0-9]+)?|{decimal}[0-9]+"
+    # Symbols are tried longest first, so that e.g. 'US$' is tried before '$'.
+    symbols = "|".join(map(re.escape, sorted(currency_symbols, key=len, reverse=True)))
+    patterns = {
+        "integer": rf"(?P<sign>[+-]?)(?P<number>{integer})",
+        "decimal": rf"(?P<sign>[+-]?)(?P<number>{number})",
+        "percent": rf"(?P<sign>[+-]?)(?P<number>{number}) ?%",
+        # The sign can come before or after a leading currency symbol.
+        "currency": (
+            rf"(?P<sign>[+-]?)(?:(?:{symbols}) ?(?P<sign2>[+-]?)(?P<number>{number})"
+            rf"|(?P<number2>{number}) ?(?:{symbols}))"
+            if symbols
+            else "(?!)"
+        ),
+        "date": DATE.pattern,
+    }
+    return {
+        column_type: re.compile(pattern) for column_type, pattern in patterns.items()
+    }
+
+
+def _number_converter(
+    pattern: re.Pattern[str], group_symbol: str, decimal_symbol: str
+) -> Converter:
+    def convert(value: str) -> Cell:
+        match = pattern.fullmatch(value)
+        if match is None:
+            return value
+        groups = match.groupdict()
+        sign = "-" if "-" in (groups["sign"], groups.get("sign2")) else ""
+        number = groups["number"] or groups["number2"]
+        if group_symbol:
+            number = number.replace(group_symbol, "")
+        return Decimal(sign + number.replace(decimal_symbol, "."))
+
+    return convert
+
+
+def _date_converter(value: str) -> Cell:
+    if DATE.fullmatch(value) is None:
+        return value
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        # Not a real date, e.g. '2024-02-30'.
+        return value
+
+
+def _convert_row(row: Row, converters: list[Converter | None]) -> Row:
+    return [
+        convert(cell)
+        if convert is not None and isinstance(cell, str) and cell
+        else cell
+        for convert, cell in zip(converters, row)
+    ] + row[len(converters) :]
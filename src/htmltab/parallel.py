@@ -0,0 +1,202 @@
+"""
+Convert the rows of a single large table in a pool of worker processes.
+The first chunk of rows is converted in this process as it's read.
+Parsed elements can't be sent between processes, so the ``tr`` elements
+after it are serialized back to HTML in chunks, and each chunk is parsed
+and converted by a worker. The converted chunks are yielded in their
+original order, so the rows are the same as those from
+:func:`~htmltab.extract.convert_rows`.
+
+A chunk is only ended at a row that no cell in an earlier row spans
+down into, so cells that span multiple rows are repeated exactly as
+they would be if the table were converted in one go.
+"""
+
+import collections
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator
+
+import lxml.etree
+import lxml.html
+
+from .extract import TABLE_ROWS, Row, cell_row_span, convert_rows
+
+# Number of rows in each chunk sent to a worker process. Chunks can be longer
+# than this when cells span rows past the end of a chunk.
+CHUNK_ROWS = 5000
+
+# Number of chunks queued for each worker process. Queueing more than one
+# keeps workers busy while their results are collected, and queueing only a
+# few keeps the serialized HTML waiting to be converted to a minimum.
+CHUNKS_PER_WORKER = 2
+
+# Cells that might span more than one row.
+SPANNING_CELLS = lxml.etree.XPath("./th[@rowspan]|./td[@rowspan]")
+
+# A chunk of rows, as lists of serialized ``tr`` elements. Rows are grouped by
+# the row group (thead, tbody, or tfoot) they belong to, as cells can't span
+# rows beyond the end of their row group.
+type Chunk = list[list[str]]
+
+
+def convert_rows_parallel(
+    elements: Iterable[lxml.html.HtmlElement],
+    jobs: int | None,
+    null_values: list[str],
+    convert_numbers: bool,
+    group_symbol: str,
+    decimal_symbol: str,
+    currency_symbols: list[str],
+) -> Iterator[Row]:
+    """
+    Convert each ``tr`` element in ``elements`` to a row of cells, as
+    :func:`~htmltab.extract.convert_rows` does, in a pool of ``jobs``
+    worker processes (one per CPU if ``jobs`` is ``None``). The rows are
+    yielded in order.
+
+    The first chunk of rows is converted in this process as it's read,
+    and the workers are only started if there are more rows after it,
+    so the rows of a small table are never serialized and parsed again.
+    """
+    options = (
+        null_values,
+        convert_numbers,
+        group_symbol,
+        decimal_symbol,
+        currency_symbols,
+    )
+    elements = iter(elements)
+    rest: list[lxml.html.HtmlElement] = []
+    yield from convert_rows(_first_chunk(elements, CHUNK_ROWS, rest), *options)
+    if not rest:
+        return
+
+    workers = jobs or os.cpu_count() or 1
+    executor = process_pool(workers)
+    pending: collections.deque[Future[list[Row]]] = collections.deque()
+    try:
+        for chunk in _chunks(itertools.chain(rest, elements), CHUNK_ROWS):
+            pending.append(executor.submit(_convert_chunk, chunk, *options))
+            if len(pending) >= workers * CHUNKS_PER_WORKER:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        # The caller may stop iterating early, so chunks that haven't started
+        # are cancelled rather than converted.
+        executor.shutdown(cancel_futures=True)
+
+
+def process_pool(
+    workers: int | None, initializer: Callable[[], object] | None = None
+) -> ProcessPoolExecutor:
+    """
+    Return a pool of ``workers`` worker processes (one per CPU if
+    ``workers`` is ``None``), each of which calls ``initializer`` when
+    it starts. Workers are started in a new interpreter rather than
+    forked, because forking a process that has other threads running
+    (such as a server's) can leave the workers deadlocked.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=initializer,
+    )
+
+
+def _first_chunk(
+    elements: Iterator[lxml.html.HtmlElement],
+    size: int,
+    rest: list[lxml.html.HtmlElement],
+) -> Iterator[lxml.html.HtmlElement]:
+    """
+    Yield the ``tr`` elements in ``elements`` that make up the first
+    chunk of rows, ending it where :func:`_chunks` would. The element
+    that starts the next chunk, if there is one, is appended to ``rest``
+    rather than yielded, and the rest of the rows are left in
+    ``elements``.
+    """
+    num_rows = 0
+    row_group = None
+    # Number of rows after the current one that a cell spans down into.
+    spanned: float = 0
+    for tr in elements:
+        if tr.getparent() is not row_group:
+            row_group = tr.getparent()
+            spanned = 0
+        if num_rows >= size and not spanned:
+            rest.append(tr)
+            return
+        yield tr
+        num_rows += 1
+        cells = SPANNING_CELLS(tr)
+        row_span = max(map(cell_row_span, cells)) if cells else 1
+        spanned = max(spanned - 1, row_span - 1)
+
+
+def _chunks(elements: Iterable[lxml.html.HtmlElement], size: int) -> Iterator[Chunk]:
+    """
+    Serialize each ``tr`` element in ``elements`` as HTML, and yield the
+    rows in chunks of at least ``size`` rows (except for the last). Each
+    element is serialized as soon as it's read, so elements can be
+    discarded as they are when streaming.
+    """
+    chunk: Chunk = []
+    num_rows = 0
+    row_group = None
+    # Number of rows after the current one that a cell spans down into.
+    spanned: float = 0
+    for tr in elements:
+        if tr.getparent() is not row_group:
+            row_group = tr.getparent()
+            spanned = 0
+            if num_rows >= size:
+                yield chunk
+                chunk, num_rows = [], 0
+            chunk.append([])
+        elif num_rows >= size and not spanned:
+            yield chunk
+            chunk, num_rows = [[]], 0
+        html = lxml.etree.tostring(
+            tr, encoding="unicode", method="html", with_tail=False
+        )
+        chunk[-1].append(html)
+        num_rows += 1
+        # Most rows have no cells that span rows, and checking the HTML for
+        # the attribute is much quicker than looking for the cells.
+        row_span = 1
+        if "rowspan" in html:
+            row_span = max(map(cell_row_span, SPANNING_CELLS(tr)), default=1)
+        spanned = max(spanned - 1, row_span - 1)
+    if chunk:
+        yield chunk
+
+
+def _convert_chunk(
+    chunk: Chunk,
+    null_values: list[str],
+    convert_numbers: bool,
+    group_symbol: str,
+    decimal_symbol: str,
+    currency_symbols: list[str],
+) -> list[Row]:
+    """
+    Parse a chunk of serialized rows, and return the rows converted by
+    :func:`~htmltab.extract.convert_rows`. Each row group in the chunk
+    is parsed as its own ``tbody`` element.
+    """
+    html = "".join("<tbody>" + "".join(rows) + "</tbody>" for rows in chunk)
+    table = lxml.html.fragment_fromstring("<table>" + html + "</table>")
+    return list(
+        convert_rows(
+            TABLE_ROWS(table),
+            null_values,
+            convert_numbers,
+            group_symbol,
+            decimal_symbol,
+            currency_symbols,
+        )
+    )
@@ -0,0 +1,145 @@
+"""
+Cache the finished output of converting tables, so that converting the
+same document again with the same options writes the cached output
+instead of parsing and converting the document again. Entries are keyed
+by a hash of the document's bytes and the options that affect the
+output, and stored in a :class:`~htmltab.cache.DiskCache`.
+"""
+
+import hashlib
+import importlib.metadata
+import io
+import json
+from pathlib import Path
+from typing import IO, Any
+
+from .extract import DEFAULT_CURRENCY_SYMBOLS, DEFAULT_NULL_VALUES
+
+# Size of the blocks a document is read in to hash it.
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# The options that affect the output of a conversion, and their default values.
+# Options not given when making a key take these values, so the same
+# conversion has the same key whether it's run by ``htmltab`` or
+# ``htmltab-batch``.
+DEFAULT_OPTIONS: dict[str, Any] = {
+    "select": ["1"],
+    "null_values": DEFAULT_NULL_VALUES,
+    "convert_numbers": True,
+    "infer_types": False,
+    "group_symbol": ",",
+    "decimal_symbol": ".",
+    "currency_symbols": DEFAULT_CURRENCY_SYMBOLS,
+    "delimiter": ",",
+    "format": "csv",
+    "pad": True,
+    "columns": None,
+    "offset": 0,
+    "limit": None,
+    "stream": False,
+    "encoding": None,
+}
+
+
+def document_digest(
+    source: bytes | Path | IO[bytes],
+) -> tuple[str, bytes | Path | IO[bytes]]:
+    """
+    Return the SHA-256 hash of the HTML document ``source`` --- bytes,
+    the path to a local file, or a binary file object --- along with
+    the source to read the document from afterwards.
+
+    A file object is read to the end to hash it. If it's seekable it's
+    then returned to where it was, and otherwise (e.g. ``stdin``) its
+    contents are returned as a new file object.
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, bytes):
+        digest.update(source)
+    elif isinstance(source, Path):
+        with open(source, "rb") as fh:
+            while chunk := fh.read(HASH_CHUNK_SIZE):
+                digest.update(chunk)
+    elif source.seekable():
+        start = source.tell()
+        while chunk := source.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+        source.seek(start)
+    else:
+        content = source.read()
+        digest.update(content)
+        return digest.hexdigest(), io.BytesIO(content)
+    return digest.hexdigest(), source
+
+
+def result_key(digest: str, options: dict[str, Any]) -> str:
+    """
+    Return the cache key for converting the document whose hash is
+    ``digest`` with ``options``. Options left out, and empty lists of
+    null values or currency symbols, take their default values (see
+    :data:`DEFAULT_OPTIONS`). The version of HTMLTab is part of the key,
+    so upgrading doesn't reuse output from an earlier version.
+    """
+    unknown = options.keys() - DEFAULT_OPTIONS.keys()
+    if unknown:
+        raise ValueError(f"unknown options: {', '.join(sorted(unknown))}")
+    normalised = DEFAULT_OPTIONS | options
+    for name in ("null_values", "currency_symbols"):
+        normalised[name] = list(normalised[name] or DEFAULT_OPTIONS[name])
+    # Null values are matched exactly, so their order doesn't matter.
+    normalised["null_values"] = sorted(set(normalised["null_values"]))
+    if normalised["select"] is not None:
+        normalised["select"] = list(normalised["select"])
+    try:
+        version = importlib.metadata.version("htmltab")
+    except importlib.metadata.PackageNotFoundError:
+        version = "unknown"
+    return "result:{}:{}:{}".format(
+        version,
+        digest,
+        json.dumps(normalised, sort_keys=True),
+    )
+
+
+def split_result(data: bytes, metadata: dict[str, Any]) -> list[bytes]:
+    """
+    Split a cached result into the output for each table.
+    """
+    outputs = []
+    start = 0
+    for length in metadata["lengths"]:
+        outputs.append(data[start : start + length])
+        start += length
+    return outputs
+
+
+class CapturingFile:
+    """
+    Wraps a text or binary file object, keeping a copy of everything
+    written to it, so it can be cached once the output is complete. Text
+    is kept encoded as UTF-8. If more than ``max_size`` bytes are
+    written, the copy is thrown away, and :attr:`value` is ``None``.
+    """
+
+    def __init__(self, file: IO[Any], max_size: int):
+        self.file = file
+        self.max_size = max_size
+        self._parts: list[bytes] | None = []
+        self._size = 0
+
+    def write(self, data: str | bytes) -> int:
+        if self._parts is not None:
+            part = data.encode("utf-8") if isinstance(data, str) else bytes(data)
+            self._size += len(part)
+            if self._size > self.max_size:
+                self._parts = None
+            else:
+                self._parts.append(part)
+        return self.file.write(data)
+
+    @property
+    def value(self) -> bytes | None:
+        return None if self._parts is None else b"".join(self._parts)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.file, name)
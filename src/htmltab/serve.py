@@ -0,0 +1,583 @@
+"""
+Long-running server that converts HTML tables sent to it over HTTP.
+Starting Python and importing HTMLTab's dependencies takes far longer
+than converting a small table, so a program that converts many tables
+can keep one server running and send it each document, rather than
+running ``htmltab`` once per document.
+
+POST the HTML document as the body of the request. Options are given in
+the query string, named after ``htmltab``'s command-line options, and
+the table is sent back in the response. Tables are converted in a pool of
+worker processes, so the server can convert as many tables at once as
+there are CPUs.
+
+    $ htmltab-serve --port 8000 &
+    $ curl --data-binary @data.html "http://localhost:8000/?select=table.data&limit=10"
+"""
+
+import codecs
+import http.server
+import importlib.util
+import io
+import itertools
+import os
+import signal
+import socketserver
+import stat
+import sys
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, Any, Iterable, Iterator
+
+import click
+from lxml.etree import LxmlError
+
+from .extract import (
+    DEFAULT_CURRENCY_SYMBOLS,
+    Row,
+    extract_table,
+    fill_rows,
+    pad_rows,
+)
+from .infer import infer_types
+from .parallel import process_pool
+from .writers import BINARY_FORMATS, WRITERS
+
+# Size of the chunks the response body is sent in.
+CHUNK_SIZE = 64 * 1024
+
+# Default maximum size of an HTML document, in bytes.
+MAX_SIZE = 100 * 1024 * 1024
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Query-string parameters that take a value, and those that are flags.
+VALUE_PARAMETERS = frozenset(
+    {
+        "select",
+        "null-value",
+        "group-symbol",
+        "decimal-symbol",
+        "currency-symbol",
+        "delimiter",
+        "format",
+        "columns",
+        "offset",
+        "limit",
+        "encoding",
+    }
+)
+FLAG_PARAMETERS = frozenset({"keep-numbers", "infer-types", "no-pad", "stream"})
+MULTIPLE_PARAMETERS = frozenset({"null-value", "currency-symbol"})
+
+
+@click.command()
+@click.option(
+    "--host",
+    default="127.0.0.1",
+    show_default=True,
+    help="Address to listen on.",
+)
+@click.option(
+    "--port",
+    "-p",
+    type=click.IntRange(min=0, max=65535),
+    default=8000,
+    show_default=True,
+    help="Port to listen on.",
+)
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False),
+    help="Listen on this Unix domain socket instead of a TCP port.",
+)
+@click.option(
+    "--workers",
+    "-w",
+    type=click.IntRange(min=1),
+    help="Number of requests to handle at the same time, each converted in its "
+    "own process.  [default: number of CPUs]",
+)
+@click.option(
+    "--max-size",
+    type=click.IntRange(min=1),
+    default=100,
+    show_default=True,
+    help="Maximum size of an HTML document in megabytes.",
+)
+@click.option(
+    "--quiet/--no-quiet",
+    "-q",
+    default=False,
+    help="Don't log each request to stderr.  [default: no-quiet]",
+)
+@click.version_option()
+def main(
+    host: str,
+    port: int,
+    socket_path: str | None,
+    workers: int | None,
+    max_size: int,
+    quiet: bool,
+):
+    """
+    <https://flother.github.io/htmltab/serve/>
+
+    Run a server that converts HTML tables sent to it over HTTP. POST an
+    HTML document to the server, with options in the query string, and
+    the table is sent back as CSV.
+
+    To listen on port 8080 of every network interface:
+
+      htmltab-serve --host 0.0.0.0 --port 8080
+
+    To listen on a Unix domain socket:
+
+      htmltab-serve --socket /run/htmltab.sock
+    """
+    _warm_up()
+    server: socketserver.BaseServer
+    if socket_path is not None:
+        # Remove a socket left behind by a server that didn't shut down
+        # cleanly, but nothing else.
+        if os.path.exists(socket_path) and _is_socket(socket_path):
+            os.unlink(socket_path)
+        server = UnixServer(
+            socket_path,
+            RequestHandler,
+            workers=workers,
+            max_size=max_size * 1024 * 1024,
+            quiet=quiet,
+        )
+        address = socket_path
+    else:
+        server = HTTPServer(
+            (host, port),
+            RequestHandler,
+            workers=workers,
+            max_size=max_size * 1024 * 1024,
+            quiet=quiet,
+        )
+        address = f"http://{host}:{server.server_address[1]}/"
+    # Shut down cleanly, removing the socket, when asked to by a process
+    # manager as well as by Ctrl-C.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    click.echo(f"Listening on {address}", err=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path is not None:
+            os.unlink(socket_path)
+
+
+class PoolMixIn:
+    """
+    Mix-in for :mod:`socketserver` servers that handles each request in a
+    fixed-size pool of ``workers`` threads, rather than in a new thread
+    per request as :class:`socketserver.ThreadingMixIn` does. Requests
+    beyond the size of the pool wait their turn.
+
+    Converting a table is CPU-bound, and threads can't convert more than
+    one table at a time, so tables are converted in a pool of
+    ``workers`` processes (see :func:`convert_document`) while the
+    threads receive documents and send responses.
+
+    Documents larger than ``max_size`` bytes are rejected, and requests
+    aren't logged if ``quiet`` is true.
+    """
+
+    def __init__(
+        self,
+        *args,
+        workers: int | None = None,
+        max_size: int = MAX_SIZE,
+        quiet: bool = False,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.max_size = max_size
+        self.quiet = quiet
+        workers = workers or os.cpu_count() or 1
+        self.pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="htmltab"
+        )
+        self.processes = process_pool(workers, initializer=_warm_up)
+        # Worker processes are otherwise started by the first requests, which
+        # would have to wait for Python to start and the modules to import.
+        for future in [self.processes.submit(os.getpid) for _ in range(workers)]:
+            future.result()
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)  # type: ignore[attr-defined]
+        except Exception:
+            self.handle_error(request, client_address)  # type: ignore[attr-defined]
+        finally:
+            self.shutdown_request(request)  # type: ignore[attr-defined]
+
+    def server_close(self):
+        super().server_close()  # type: ignore[misc]
+        self.pool.shutdown()
+        self.processes.shutdown()
+
+
+class HTTPServer(PoolMixIn, http.server.HTTPServer):
+    pass
+
+
+class UnixServer(PoolMixIn, socketserver.UnixStreamServer):
+    pass
+
+
+class RequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Convert the HTML document in the body of each POST request, and send
+    the table back in the response. Connections are kept open between
+    requests, and responses are sent in chunks as rows are converted.
+    """
+
+    protocol_version = "HTTP/1.1"
+    server_version = "HTMLTab"
+    error_content_type = "text/plain; charset=utf-8"
+    error_message_format = "%(explain)s\n"
+    # Buffer the response, so that the headers and a small table are sent in
+    # one packet rather than waiting on the client to acknowledge each part.
+    wbufsize = CHUNK_SIZE
+
+    def do_POST(self):
+        try:
+            length = int(self.headers["Content-Length"])
+        except (TypeError, ValueError):
+            self.send_error(411, explain="Content-Length header is required")
+            return
+        if length > self.server.max_size:  # type: ignore[attr-defined]
+            self.send_error(413, explain="HTML document is too large")
+            return
+        body = _BodyFile(self.rfile, length)
+        try:
+            self._convert(body)
+        finally:
+            # The rest of the body has to be read before the next request on
+            # the same connection can be.
+            body.discard()
+
+    def _convert(self, body: IO[bytes]):
+        try:
+            query = urllib.parse.urlsplit(self.path).query
+            options, output_options = parse_options(query)
+        except ValueError as err:
+            self.send_error(400, explain=str(err))
+            return
+        output_format = output_options["format"]
+        if not options["stream"]:
+            self._convert_document(body, options, output_options)
+            return
+        try:
+            rows = iter(convert(body, options, output_options))
+            # Parsing errors, and not finding the table when streaming, are
+            # raised when the first row is requested. Requesting it before
+            # starting the response means they can be reported as errors.
+            first = next(rows, None)
+        except ValueError as err:
+            self.send_error(400, explain=str(err))
+            return
+        except (LxmlError, TypeError):
+            self.send_error(400, explain="could not parse HTML")
+            return
+        if first is not None:
+            rows = itertools.chain([first], rows)
+
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPES[output_format])
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        output = io.BufferedWriter(_ChunkedWriter(self.wfile), CHUNK_SIZE)
+        try:
+            write_rows(rows, output, output_options)
+            output.flush()
+        except (LxmlError, ValueError):
+            # The response has already started, so the only way left to tell
+            # the client something went wrong is to drop the connection
+            # without ending the response.
+            self.close_connection = True
+            return
+        self.wfile.write(b"0\r\n\r\n")
+        # Send the end of the response before reading the rest of the body, so
+        # the client isn't kept waiting if it's stopped early (e.g. by a limit).
+        self.wfile.flush()
+
+    def _convert_document(
+        self, body: IO[bytes], options: dict[str, Any], output_options: dict[str, Any]
+    ):
+        """
+        Convert the whole document in a worker process, and send the
+        table back once it's been converted.
+        """
+        html = body.read()
+        try:
+            future = self.server.processes.submit(  # type: ignore[attr-defined]
+                convert_document, html, options, output_options
+            )
+            data = future.result()
+        except ValueError as err:
+            self.send_error(400, explain=str(err))
+            return
+        except Exception:
+            # Anything else is the server's fault (e.g. a worker process that
+            # died), but the client still gets a response.
+            self.log_error("error converting table in worker process")
+            self.send_error(500, explain="could not convert table")
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPES[output_options["format"]])
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        self.wfile.flush()
+
+    def handle_expect_100(self) -> bool:
+        # Clients that ask before sending a large body wait for the answer, so
+        # it can't sit in the buffer.
+        result = super().handle_expect_100()
+        self.wfile.flush()
+        return result
+
+    def address_string(self) -> str:
+        # Clients connected over a Unix domain socket have no address.
+        if isinstance(self.client_address, tuple):
+            return super().address_string()
+        return "unix"
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:  # type: ignore[attr-defined]
+            super().log_message(format, *args)
+
+
+def parse_options(query: str) -> tuple[dict[str, Any], dict[str, Any]]:
+    """
+    Convert the parameters in a query string to options. Parameters are
+    named after ``htmltab``'s command-line options, without the leading
+    dashes (e.g. ``select=table.data&null-value=-&keep-numbers``).
+
+    Returns two dictionaries: the keyword arguments to pass to
+    :func:`~htmltab.extract.extract_table`, and the options that control
+    how the rows are written.
+
+    Raises:
+        :class:`ValueError`: a parameter is unknown, given more than
+            once when it can't be, or has an invalid value, or the output
+            format needs a package that isn't installed
+    """
+    params: dict[str, list[str]] = {}
+    for name, value in urllib.parse.parse_qsl(query, keep_blank_values=True):
+        if name not in VALUE_PARAMETERS and name not in FLAG_PARAMETERS:
+            raise ValueError(f"unknown parameter '{name}'")
+        params.setdefault(name, []).append(value)
+        if len(params[name]) > 1 and name not in MULTIPLE_PARAMETERS:
+            raise ValueError(f"'{name}' given more than once")
+
+    def value(name: str, default: Any = None) -> Any:
+        return params[name][0] if name in params else default
+
+    def flag(name: str) -> bool:
+        if name not in params:
+            return False
+        elif params[name][0].lower() in ("", "1", "true", "yes"):
+            return True
+        elif params[name][0].lower() in ("0", "false", "no"):
+            return False
+        raise ValueError(f"'{name}' must be true or false")
+
+    def integer(name: str, minimum: int = 0) -> int | None:
+        if name not in params:
+            return None
+        elif not params[name][0].isdigit():
+            raise ValueError(f"'{name}' must be a whole number")
+        elif int(params[name][0]) < minimum:
+            raise ValueError(f"'{name}' must be at least {minimum}")
+        return int(params[name][0])
+
+    delimiter = value("delimiter", ",")
+    if len(delimiter) != 1:
+        raise ValueError("delimiter must be a single character")
+    encoding = value("encoding")
+    if encoding is not None:
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            raise ValueError(f"unknown encoding '{encoding}'") from None
+    output_format = value("format", "csv")
+    if output_format not in WRITERS:
+        raise ValueError(f"'format' must be one of {', '.join(WRITERS)}")
+    if output_format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        raise ValueError("'format=parquet' requires pyarrow")
+    options = {
+        "select": value("select", "1"),
+        "null_values": params.get("null-value"),
+        "convert_numbers": not flag("keep-numbers") and not flag("infer-types"),
+        "group_symbol": value("group-symbol", ","),
+        "decimal_symbol": value("decimal-symbol", "."),
+        "currency_symbols": params.get("currency-symbol"),
+        "stream": flag("stream"),
+        "encoding": encoding,
+    }
+    output_options = {
+        "infer_types": flag("infer-types"),
+        "delimiter": delimiter,
+        "format": output_format,
+        "pad": not flag("no-pad"),
+        "columns": integer("columns", minimum=1),
+        "offset": integer("offset") or 0,
+        "limit": integer("limit"),
+    }
+    return options, output_options
+
+
+def convert(
+    source: IO[bytes], options: dict[str, Any], output_options: dict[str, Any]
+) -> Iterator[Row]:
+    """
+    Convert the table in the HTML document ``source`` as ``htmltab``
+    would with the same options, and return an iterator over its rows.
+    """
+    rows: Iterator[Row] = extract_table(source, **options)
+    if output_options["infer_types"]:
+        rows = infer_types(
+            rows,
+            options["group_symbol"],
+            options["decimal_symbol"],
+            options["currency_symbols"] or DEFAULT_CURRENCY_SYMBOLS,
+        )
+    offset, limit = output_options["offset"], output_options["limit"]
+    if offset or limit is not None:
+        rows = itertools.islice(rows, offset, None if limit is None else offset + limit)
+    # As with ``htmltab``, rows are padded to the same length unless that means
+    # waiting for the whole table to be converted when streaming.
+    if output_options["format"] in BINARY_FORMATS:
+        pass
+    elif output_options["columns"] is not None:
+        rows = fill_rows(rows, output_options["columns"])
+    elif output_options["pad"] and not options["stream"]:
+        rows = iter(pad_rows(rows))
+    return rows
+
+
+def convert_document(
+    html: bytes, options: dict[str, Any], output_options: dict[str, Any]
+) -> bytes:
+    """
+    Convert the table in the HTML document ``html`` as :func:`convert`
+    does, and return the table written in the output format. This is
+    run in a worker process, so any error is raised as a
+    :class:`ValueError` that can be sent back to the server.
+    """
+    output = io.BytesIO()
+    try:
+        rows = convert(io.BytesIO(html), options, output_options)
+        write_rows(rows, output, output_options)
+    except (LxmlError, TypeError):
+        raise ValueError("could not parse HTML") from None
+    return output.getvalue()
+
+
+def write_rows(rows: Iterable[Row], output: IO[bytes], output_options: dict[str, Any]):
+    """
+    Write ``rows`` to the binary file ``output`` in the output format,
+    encoding text formats as UTF-8.
+    """
+    output_format = output_options["format"]
+    write = WRITERS[output_format]
+    if output_format in BINARY_FORMATS:
+        write(rows, output)
+        return
+    text = io.TextIOWrapper(output, encoding="utf-8", newline="")
+    if output_format == "csv":
+        write(rows, text, delimiter=output_options["delimiter"])
+    else:
+        write(rows, text)
+    text.detach()
+
+
+class _BodyFile(io.RawIOBase):
+    """
+    The body of a request as a binary file object, which reads no more
+    than ``length`` bytes from the connection. Closing it leaves the
+    connection open.
+    """
+
+    def __init__(self, file: IO[bytes], length: int):
+        self.file = file
+        self.remaining = length
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size) if size else b""
+        self.remaining -= len(data)
+        if size and not data:
+            # The client closed the connection before sending the whole body.
+            self.remaining = 0
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def discard(self):
+        """
+        Read and throw away the rest of the body.
+        """
+        while self.read(CHUNK_SIZE):
+            pass
+
+    def close(self):
+        # The connection belongs to the server, so it isn't closed.
+        pass
+
+
+class _ChunkedWriter(io.RawIOBase):
+    """
+    Writes each block of data it's given to ``file`` as a chunk of an
+    HTTP response sent with chunked transfer encoding.
+    """
+
+    def __init__(self, file: IO[bytes]):
+        self.file = file
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        if data:
+            self.file.write(b"%x\r\n%s\r\n" % (len(data), bytes(data)))
+        return len(data)
+
+
+def _warm_up():
+    """
+    Import the modules that are otherwise only imported when they're first
+    needed, so that the first requests that need them aren't slowed down.
+    This is run in the server process, which converts streamed documents,
+    and in each worker process as it starts.
+    """
+    import bs4.dammit  # noqa: F401
+    import lxml.cssselect  # noqa: F401
+
+
+def _is_socket(path: str) -> bool:
+    return stat.S_ISSOCK(os.stat(path).st_mode)
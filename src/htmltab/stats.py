@@ -0,0 +1,237 @@
+"""
+Measure the stages of converting a table: fetching the document,
+decoding it, parsing it, selecting the table, converting its rows, and
+writing them. Each stage reports its wall-clock time and what it
+processed (bytes, elements, rows, or cells) to every registered hook, so
+library users can send the measurements to their own monitoring.
+
+    >>> from htmltab import extract_table, stats
+    >>> with stats.collect() as collector:
+    ...     rows = list(extract_table("<table><tr><td>1</td></tr></table>"))
+    >>> sorted(collector.stages)
+    ['convert', 'parse', 'select']
+
+When no hooks are registered, the only cost is reading the clock once
+before and after each stage of each document; rows are only counted
+while a hook is registered.
+"""
+
+import contextlib
+import sys
+import threading
+import time
+from typing import IO, Any, Callable, Iterable, Iterator, Sized
+
+# Stages of a conversion, in the order they happen. When streaming, the
+# document is parsed as rows are converted, so parsing is counted as part of
+# the ``convert`` stage.
+STAGES = ("fetch", "decode", "parse", "select", "convert", "write")
+
+type Metrics = dict[str, int | float]
+type Hook = Callable[[str, Metrics], None]
+
+_hooks: list[Hook] = []
+
+
+def add_hook(hook: Hook):
+    """
+    Register ``hook`` to be called at the end of each stage of every
+    conversion, with the name of the stage and a dictionary of its
+    metrics. The metrics always include ``seconds``, the wall-clock time
+    the stage took, and may include ``bytes_in``, ``bytes_out``,
+    ``elements``, ``rows``, and ``cells``.
+
+    Hooks are called in whichever thread ran the stage, so they must be
+    thread-safe if tables are converted in more than one thread.
+    """
+    _hooks.append(hook)
+
+
+def remove_hook(hook: Hook):
+    """
+    Unregister a hook registered with :func:`add_hook`.
+    """
+    _hooks.remove(hook)
+
+
+def enabled() -> bool:
+    """
+    Return whether any hooks are registered.
+    """
+    return bool(_hooks)
+
+
+def emit(stage: str, metrics: Metrics):
+    """
+    Call every registered hook with the metrics of a finished stage.
+    """
+    for hook in tuple(_hooks):
+        hook(stage, metrics)
+
+
+@contextlib.contextmanager
+def timed(stage: str) -> Iterator[Metrics]:
+    """
+    Time the code within the ``with`` block as ``stage``, and report it
+    to the hooks when the block ends, even if it raises. The block can
+    add metrics to the dictionary it's given.
+    """
+    metrics: Metrics = {}
+    start = time.perf_counter()
+    try:
+        yield metrics
+    finally:
+        metrics["seconds"] = time.perf_counter() - start
+        emit(stage, metrics)
+
+
+def measure_rows[T: Sized](rows: Iterable[T], stage: str = "convert") -> Iterator[T]:
+    """
+    Yield each row in ``rows``, timing how long each takes to produce,
+    and counting the rows and cells. Once the rows are exhausted, or the
+    caller stops iterating early, the totals are reported to the hooks as
+    ``stage``. Time the caller spends between rows isn't counted.
+    """
+    metrics: Metrics = {"seconds": 0.0, "rows": 0, "cells": 0}
+    try:
+        yield from _counted(rows, metrics)
+    finally:
+        emit(stage, metrics)
+
+
+@contextlib.contextmanager
+def measure_output[T: Sized](
+    rows: Iterable[T], output: IO[Any], stage: str = "write"
+) -> Iterator[tuple[Iterator[T], IO[Any]]]:
+    """
+    Measure writing ``rows`` to the file object ``output`` within the
+    ``with`` block, which is given the rows and a file object to write
+    them to. When the block ends, the time taken, the number of rows,
+    and the number of bytes written are reported to the hooks as
+    ``stage``. Time spent producing the rows (e.g. converting them) isn't
+    counted, as it's already counted by its own stage.
+    """
+    produced: Metrics = {"seconds": 0.0, "rows": 0, "cells": 0}
+    counting = _CountingFile(output)
+    start = time.perf_counter()
+    try:
+        yield _counted(rows, produced), counting
+    finally:
+        emit(
+            stage,
+            {
+                "seconds": time.perf_counter() - start - produced["seconds"],
+                "rows": produced["rows"],
+                "bytes_out": counting.bytes_written,
+            },
+        )
+
+
+def _counted[T: Sized](rows: Iterable[T], metrics: Metrics) -> Iterator[T]:
+    """
+    Yield each row in ``rows``, adding the time taken to produce it and
+    the number of rows and cells to ``metrics``.
+    """
+    rows = iter(rows)
+    while True:
+        start = time.perf_counter()
+        try:
+            row = next(rows)
+        except StopIteration:
+            return
+        finally:
+            metrics["seconds"] += time.perf_counter() - start
+        metrics["rows"] += 1
+        metrics["cells"] += len(row)
+        yield row
+
+
+class _CountingFile:
+    """
+    Wraps a text or binary file object, counting the bytes written to it.
+    Text is counted in the file's encoding.
+    """
+
+    def __init__(self, file: IO[Any]):
+        self.file = file
+        self.bytes_written = 0
+
+    def write(self, data: str | bytes) -> int:
+        if isinstance(data, str):
+            encoding = getattr(self.file, "encoding", None) or "utf-8"
+            self.bytes_written += len(data.encode(encoding, "replace"))
+        else:
+            self.bytes_written += len(data)
+        return self.file.write(data)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.file, name)
+
+
+class Collector:
+    """
+    A hook that adds up the metrics of each stage across every
+    conversion, and counts the number of times each stage ran.
+    """
+
+    def __init__(self):
+        self.stages: dict[str, Metrics] = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def __call__(self, stage: str, metrics: Metrics):
+        with self._lock:
+            totals = self.stages.setdefault(stage, {"calls": 0})
+            totals["calls"] += 1
+            for name, value in metrics.items():
+                totals[name] = totals.get(name, 0) + value
+
+    def report(self) -> dict[str, Any]:
+        """
+        Return the totals for each stage, in the order the stages happen,
+        the wall-clock time since the collector was created, and the peak
+        resident set size of the process in bytes (or ``None`` where it
+        can't be measured).
+        """
+        with self._lock:
+            stages = {
+                stage: dict(self.stages[stage])
+                for stage in sorted(self.stages, key=_stage_order)
+            }
+        return {
+            "seconds": time.perf_counter() - self._start,
+            "stages": stages,
+            "peak_rss": peak_rss(),
+        }
+
+
+@contextlib.contextmanager
+def collect() -> Iterator[Collector]:
+    """
+    Register a :class:`Collector` as a hook for the duration of the
+    ``with`` block.
+    """
+    collector = Collector()
+    add_hook(collector)
+    try:
+        yield collector
+    finally:
+        remove_hook(collector)
+
+
+def peak_rss() -> int | None:
+    """
+    Return the peak resident set size of the process in bytes, or
+    ``None`` on platforms (e.g. Windows) where it isn't available.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports the peak in kilobytes, macOS in bytes.
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def _stage_order(stage: str) -> int:
+    return STAGES.index(stage) if stage in STAGES else len(STAGES)
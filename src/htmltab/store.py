@@ -0,0 +1,224 @@
+"""
+Compact storage for the rows of a table that has to be held in memory,
+e.g. to pad every row to the length of the longest. A list of Python
+objects per row costs far more than the text of its cells, so instead
+the cells are stored column by column. A column with few distinct values
+is stored as a 16-bit code per cell, indexing a list of the distinct
+values. Once a column has too many distinct values for that, each cell
+is stored as its text in a buffer of bytes, along with its type and the
+offset of its end in the buffer. Rows are rebuilt as they're read.
+"""
+
+import datetime
+import itertools
+from array import array
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any, Iterable, Iterator
+
+if TYPE_CHECKING:
+    from .extract import Cell, Row
+
+# Columns stop using codes once they have more distinct values than fit in a
+# 16-bit code. Code 0 is kept for missing cells.
+MAX_CODES = 2**16
+
+# Number of rows added to the columns at a time, and rebuilt at a time when
+# reading the rows. Working on many rows at once lets rows be split into
+# columns, and columns joined into rows, without a Python loop over cells.
+BATCH_SIZE = 1024
+
+# Types of the cells in a column stored as text. Cells past the end of a row
+# that's shorter than the longest row are missing.
+MISSING, NULL, TEXT, NUMBER, DATE = range(5)
+
+# Stands in for missing cells while rows are split into columns.
+_MISSING = object()
+
+
+class RowStore:
+    """
+    Holds the rows of a table, added with :meth:`extend`, in far less
+    memory than a list of lists. Iterating over the store yields each
+    row as a list, with empty cells added to the end of each row as
+    required so that every row has the same number of cells as the
+    longest row.
+    """
+
+    def __init__(self, rows: Iterable["Row"] = ()):
+        self._columns: list[_Column] = []
+        self._num_rows = 0
+        self.extend(rows)
+
+    def extend(self, rows: Iterable["Row"]):
+        rows = iter(rows)
+        while batch := list(itertools.islice(rows, BATCH_SIZE)):
+            columns = list(itertools.zip_longest(*batch, fillvalue=_MISSING))
+            # A column added part way through is missing a cell in earlier rows.
+            while len(self._columns) < len(columns):
+                self._columns.append(_Column(self._num_rows))
+            for column, cells in zip(self._columns, columns):
+                column.extend(cells)
+            for column in self._columns[len(columns) :]:
+                column.extend([_MISSING] * len(batch))
+            self._num_rows += len(batch)
+
+    @property
+    def num_columns(self) -> int:
+        """
+        Number of cells in the longest row.
+        """
+        return len(self._columns)
+
+    def column(self, index: int, missing: Any = None) -> list["Cell"]:
+        """
+        Return the cells in the column at ``index``, with ``missing`` in
+        place of the cells missing from rows shorter than the longest.
+        """
+        if index >= len(self._columns):
+            return [missing] * self._num_rows
+        return self._columns[index].cells(0, self._num_rows, missing)
+
+    def __len__(self) -> int:
+        return self._num_rows
+
+    def __iter__(self) -> Iterator["Row"]:
+        if not self._columns:
+            # Every row is empty.
+            for _ in range(self._num_rows):
+                yield []
+            return
+        for start in range(0, self._num_rows, BATCH_SIZE):
+            stop = min(start + BATCH_SIZE, self._num_rows)
+            columns = [column.cells(start, stop, "") for column in self._columns]
+            yield from map(list, zip(*columns))
+
+
+class _Column:
+    """
+    The cells in one column of a :class:`RowStore`, stored as codes
+    until there are too many distinct values, and as text after that.
+    """
+
+    def __init__(self, num_missing: int):
+        self.codes: array | None = array("H", bytes(2 * num_missing))
+        # The value of each code. Code 0 is for missing cells, which are read
+        # as whatever value the reader asks for.
+        self.values: list[Cell] = [None]
+        # The code of each value. Decimals that are equal can still be written
+        # differently (e.g. '1.5' and '1.50'), so they're keyed by their
+        # string, in a tuple so as not to be confused with a string cell.
+        self.keys: dict[Any, int] = {_MISSING: 0}
+        self.types = array("B")
+        self.ends = array("Q")
+        self.text = bytearray()
+
+    def extend(self, cells: Iterable[Any]):
+        if self.codes is None:
+            self._extend_text(cells)
+            return
+        codes = array("H")
+        keys = self.keys
+        values = self.values
+        cells = iter(cells)
+        for cell in cells:
+            key = (str(cell),) if cell.__class__ is Decimal else cell
+            code = keys.get(key)
+            if code is None:
+                code = len(values)
+                if code == MAX_CODES:
+                    self.codes.extend(codes)
+                    self._codes_to_text()
+                    self._extend_text(itertools.chain([cell], cells))
+                    return
+                keys[key] = code
+                values.append(cell)
+            codes.append(code)
+        self.codes.extend(codes)
+
+    def cells(self, start: int, stop: int, missing: Any) -> list["Cell"]:
+        """
+        Return the cells in rows ``start`` up to ``stop``, with
+        ``missing`` in place of missing cells.
+        """
+        if self.codes is not None:
+            values = self.values
+            values[0] = missing
+            return [values[code] for code in self.codes[start:stop]]
+        types = self.types[start:stop]
+        ends = self.ends[start:stop]
+        starts = [self.ends[start - 1] if start else 0]
+        starts += ends[:-1]
+        first, last = starts[0], ends[-1] if ends else starts[0]
+        data = self.text[first:last]
+        if data.isascii():
+            # Characters and bytes line up, so the text can be decoded at once.
+            text = data.decode("ascii")
+            strings = [text[i - first : j - first] for i, j in zip(starts, ends)]
+        else:
+            strings = [
+                data[i - first : j - first].decode("utf-8")
+                for i, j in zip(starts, ends)
+            ]
+        if types.count(TEXT) == len(types):
+            return strings
+        elif types.count(NUMBER) == len(types):
+            return list(map(Decimal, strings))
+        cells: list[Cell] = []
+        for cell_type, string in zip(types, strings):
+            if cell_type == TEXT:
+                cells.append(string)
+            elif cell_type == NUMBER:
+                cells.append(Decimal(string))
+            elif cell_type == NULL:
+                cells.append(None)
+            elif cell_type == DATE:
+                cells.append(datetime.date.fromisoformat(string))
+            else:
+                cells.append(missing)
+        return cells
+
+    def _extend_text(self, cells: Iterable[Any]):
+        types = self.types
+        ends = self.ends
+        parts: list[bytes] = []
+        end = len(self.text)
+        for cell in cells:
+            if cell.__class__ is str:
+                types.append(TEXT)
+            elif cell is None:
+                types.append(NULL)
+                ends.append(end)
+                continue
+            elif cell is _MISSING:
+                types.append(MISSING)
+                ends.append(end)
+                continue
+            elif isinstance(cell, Decimal):
+                # A decimal's string is converted back to exactly the same
+                # decimal, including its exponent (so '1.50' stays '1.50').
+                types.append(NUMBER)
+                cell = str(cell)
+            elif isinstance(cell, datetime.date):
+                types.append(DATE)
+                cell = cell.isoformat()
+            elif isinstance(cell, str):
+                types.append(TEXT)
+            else:
+                raise TypeError(f"can't store {type(cell).__name__} cells")
+            encoded = cell.encode("utf-8")
+            end += len(encoded)
+            ends.append(end)
+            parts.append(encoded)
+        self.text += b"".join(parts)
+
+    def _codes_to_text(self):
+        """
+        Switch to storing the column as text, once it has too many
+        distinct values to store as codes.
+        """
+        codes, values = self.codes, self.values
+        values[0] = _MISSING
+        self.codes = None
+        self.values = []
+        self.keys = {}
+        self._extend_text(values[code] for code in codes)  # type: ignore[union-attr]
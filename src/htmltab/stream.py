@@ -0,0 +1,180 @@
+"""
+Incremental parsing of HTML documents. Rather than building a tree for
+the whole document before selecting a table, the document is fed to
+lxml's pull parser a chunk at a time and each ``tr`` element in the
+selected table is handed over as soon as its end tag has been parsed.
+Elements that have already been processed are cleared from the tree so
+memory use stays bounded no matter how large the document is.
+"""
+
+import codecs
+import re
+from typing import IO, Any, Callable, Iterator
+
+import lxml.html
+from lxml.etree import HTMLPullParser
+
+from .utils import InvalidSelectorError, detect_encoding, lxml_encoding
+
+# Number of bytes (or characters) read from the input each time the parser
+# is fed.
+CHUNK_SIZE = 64 * 1024
+
+# The CSS selectors that can be resolved while the document is still being
+# parsed: an optional ``table`` type selector, followed by an optional id and
+# any number of class names (e.g. ``table#data``, ``.stats``, or
+# ``table.stats.wide``).
+SIMPLE_SELECTOR = re.compile(
+    r"^(?P<tag>table)?(?:#(?P<id>[\w-]+))?(?P<classes>(?:\.[\w-]+)*)$"
+)
+
+ROW_GROUPS = ("thead", "tbody", "tfoot")
+
+type TableMatcher = Callable[[lxml.html.HtmlElement, int], bool]
+
+
+def table_matcher(select: str) -> TableMatcher:
+    """
+    Return a function that decides whether a ``table`` element matches
+    ``select``. The function is called with each ``table`` element as
+    its start tag is parsed, along with the one-based index of the table
+    within the document.
+
+    Only integer indexes and simple CSS selectors (``table#id``,
+    ``table.class``) are supported, because anything more complex could
+    depend on parts of the document that haven't been parsed yet.
+
+    Raises:
+        :class:`~htmltab.utils.InvalidSelectorError`: ``select`` can't
+            be used when streaming
+    """
+    try:
+        index = int(select)
+    except ValueError:
+        pass
+    else:
+        return lambda table, table_index: table_index == index
+
+    match = SIMPLE_SELECTOR.match(select.strip())
+    if match is None or not any(match.groups()):
+        raise InvalidSelectorError(
+            f"'{select}' can't be used when streaming; use an index or a simple "
+            "CSS selector like 'table#id' or 'table.class'"
+        )
+    element_id = match["id"]
+    class_names = match["classes"].split(".")[1:]
+
+    def matches(table: lxml.html.HtmlElement, table_index: int) -> bool:
+        if element_id is not None and table.get("id") != element_id:
+            return False
+        table_classes = table.get("class", "").split()
+        return all(class_name in table_classes for class_name in class_names)
+
+    return matches
+
+
+def iter_rows(
+    html_file: IO[Any], select: str, encoding: str | None = None
+) -> Iterator[lxml.html.HtmlElement]:
+    """
+    Incrementally parse the HTML in ``html_file`` and yield each ``tr``
+    element that belongs to the table matched by ``select``. Rows within
+    tables nested inside the selected table aren't yielded, in the same
+    way as when the whole document is parsed.
+
+    Each row is cleared from the tree once the caller has finished with
+    it (when the next row is requested), so the caller must not hold on
+    to yielded elements. Parsing stops as soon as the end tag of the
+    selected table is reached.
+
+    ``encoding`` is the character encoding to use if ``html_file`` is a
+    binary file that doesn't start with a byte order mark. If it's not
+    given, the encoding is detected from the start of the file.
+
+    Raises:
+        :class:`~htmltab.utils.InvalidSelectorError`: ``select`` can't
+            be used when streaming (raised immediately)
+        :class:`ValueError`: no table matched ``select`` (raised once the
+            whole document has been parsed)
+    """
+    matches = table_matcher(select)
+    return _iter_rows(html_file, matches, encoding)
+
+
+def _iter_rows(
+    html_file: IO[Any], matches: TableMatcher, encoding: str | None
+) -> Iterator[lxml.html.HtmlElement]:
+    table = None
+    num_tables = 0
+    for event, element in parse_events(html_file, encoding):
+        if table is None:
+            if event == "start":
+                if element.tag == "table":
+                    num_tables += 1
+                    if matches(element, num_tables):
+                        table = element
+            else:
+                # Everything parsed so far lies outside the table we want.
+                discard_element(element)
+        elif event == "end":
+            if element is table:
+                return
+            if element.tag == "tr" and is_row_of(element, table):
+                yield element
+                discard_element(element)
+    if table is None:
+        raise ValueError("value matched no elements")
+
+
+def parse_events(html_file: IO[Any], encoding: str | None) -> Iterator[tuple[str, Any]]:
+    """
+    Feed the contents of ``html_file`` to lxml's pull parser one chunk
+    at a time, and yield the parser's start and end events.
+    """
+    chunk = html_file.read(CHUNK_SIZE)
+    if isinstance(chunk, bytes):
+        encoding = detect_encoding(chunk, encoding)
+    else:
+        encoding = None
+    decoder = None
+    if encoding is not None and lxml_encoding(encoding) is None:
+        # lxml can't be relied on to decode the document, so each chunk is
+        # decoded before it's fed to the parser.
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        parser = HTMLPullParser(events=("start", "end"))
+    else:
+        parser = HTMLPullParser(
+            events=("start", "end"), encoding=encoding and lxml_encoding(encoding)
+        )
+    parser.set_element_class_lookup(lxml.html.HtmlElementClassLookup())
+    while chunk:
+        parser.feed(chunk if decoder is None else decoder.decode(chunk))
+        yield from parser.read_events()
+        chunk = html_file.read(CHUNK_SIZE)
+    if decoder is not None:
+        parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    yield from parser.read_events()
+
+
+def is_row_of(tr: lxml.html.HtmlElement, table: lxml.html.HtmlElement) -> bool:
+    """
+    Return ``True`` if ``tr`` is a direct child of ``table``, or a child
+    of one of the table's ``thead``, ``tbody``, or ``tfoot`` elements.
+    """
+    parent = tr.getparent()
+    return parent is table or (
+        parent is not None and parent.tag in ROW_GROUPS and parent.getparent() is table
+    )
+
+
+def discard_element(element: lxml.html.HtmlElement):
+    """
+    Free the memory used by an element whose end tag has been parsed,
+    along with any of its preceding siblings.
+    """
+    element.clear()
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
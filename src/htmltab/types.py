@@ -1,49 +1,51 @@
+import contextlib
 from typing import Any, Optional
 
-import requests
 import requests.exceptions
 from click import Context, Parameter
 from click.types import ParamType
 from click.utils import safecall
 
+from .fetch import USER_AGENT, Fetcher, describe_error
+
 
 class URL(ParamType):
     """
     Declare a parameter to be a URL as understood by ``urllib``. The URL
     is requested using the GET method and the connection is closed once
     the context is closed (the command finishes execution).
+
+    The URL is requested using ``fetcher``, if given, so that responses
+    can be cached.
     """
 
     name = "url"
-    USER_AGENT = "HTMLTab (+https://github.com/flother/htmltab)"
+    USER_AGENT = USER_AGENT
+
+    def __init__(self, fetcher: Optional[Fetcher] = None):
+        self.fetcher = fetcher
 
     def convert(self, value: Any, param: Optional[Parameter], ctx: Optional[Context]):
         """
-        Opens the parameter value as a URL using
-        ``urllib.request.urlopen``. A custom User-Agent header is used
-        and a ten-second timeout is set, but otherwise no alterations
-        are made to the defaults (i.e. no authentication, no cookies).
-        Any error causes the command to fail.
+        Opens the parameter value as a URL using a
+        :class:`~htmltab.fetch.Fetcher`. A custom User-Agent header is
+        used and a ten-second timeout is set, but otherwise no
+        alterations are made to the defaults (i.e. no authentication, no
+        cookies, no retries). Any error causes the command to fail.
+
+        If no fetcher was given, one is created for the request and
+        closed once the response has been read.
         """
-        response = requests.get(
-            value, timeout=10, headers={"User-Agent": self.USER_AGENT}
-        )
+        fetcher_context: contextlib.AbstractContextManager[Fetcher]
+        if self.fetcher is None:
+            fetcher_context = Fetcher(retries=0)
+        else:
+            fetcher_context = contextlib.nullcontext(self.fetcher)
         try:
-            if ctx is not None:
-                ctx.call_on_close(safecall(response.close))
-            response.raise_for_status()
-        except requests.exceptions.ConnectionError:
-            self.fail(f"Connection error ({value})", param, ctx)
-        except requests.exceptions.Timeout:
-            self.fail(f"Time out ({value})", param, ctx)
-        except requests.exceptions.TooManyRedirects:
-            self.fail(f"Too many redirects ({value})", param, ctx)
-        except requests.exceptions.HTTPError:
-            self.fail(
-                f"HTTP {response.status_code} {response.reason} ({value})",
-                param,
-                ctx,
-            )
-        except requests.exceptions.RequestException:
-            self.fail(f"Request error ({value})", param, ctx)
+            with fetcher_context as fetcher:
+                response = fetcher.get(value)
+        except requests.exceptions.RequestException as err:
+            self.fail(describe_error(err, value), param, ctx)
+        if ctx is not None:
+            ctx.call_on_close(safecall(response.close))
         return response
@@ -1,40 +1,268 @@
+import codecs
+import functools
+import io
+import re
 import urllib.parse
 from decimal import Decimal, InvalidOperation
-from typing import Any
+from typing import IO, Any, Callable, Iterable, Iterator
 
+import lxml.etree
 import lxml.html
-from bs4.dammit import UnicodeDammit
 from click import Context, File, Parameter
-from lxml.cssselect import SelectorError
 from lxml.etree import LxmlError
 
-from .types import URL
+from . import stats
+
+# Number of bytes at the start of a document that are searched for a ``meta``
+# element declaring the document's character encoding.
+META_SNIFF_SIZE = 4096
+
+META_CHARSET = re.compile(
+    rb"""<meta[^>]+charset\s*=\s*["']?\s*([a-z0-9._:-]+)""", re.IGNORECASE
+)
+
+# Encodings in which a document's bytes are passed straight to lxml, keyed by
+# Python's name for them. libxml2 doesn't know every encoding that Python does
+# (e.g. 'ks_c_5601-1987' or 'mac-roman'), and parses nothing at all rather
+# than raising an error when it doesn't, so documents in any other encoding are
+# decoded by Python first.
+LXML_ENCODINGS = {"utf-8": "utf-8", "utf-16": "utf-16", "cp1252": "windows-1252"}
+
+# Number of bytes read from a file at a time when it's decoded by Python
+# before being parsed.
+DECODE_CHUNK_SIZE = 64 * 1024
+
+# Documents that start like this are parsed as whole documents, rather than
+# as fragments, by ``lxml.html.fromstring``.
+FULL_HTML = re.compile(rb"^\s*<(?:html|!doctype)", re.IGNORECASE)
+
+# Maximum number of compiled selectors kept in memory for reuse.
+SELECTOR_CACHE_SIZE = 256
+
+# Maximum number of cell values whose conversion to a number is remembered.
+NUMBER_CACHE_SIZE = 4096
+
+# Maximum number of number parsers, one for each combination of group symbol,
+# decimal symbol, and currency symbols, kept for reuse.
+NUMBER_PARSER_CACHE_SIZE = 32
+
+# Every string that :class:`decimal.Decimal` accepts is made up of only digits,
+# whitespace, signs, the decimal point, underscores, the exponent indicator,
+# and the letters of "Infinity" and "sNaN". A string that contains any other
+# character can be rejected without trying to convert it.
+NOT_NUMBER = re.compile(r"[^\s\d_.+\-eEfFiInNsStTaAyY]")
+
+ONE = Decimal("1")
+MINUS_ONE = Decimal("-1")
+
+
+class InvalidSelectorError(ValueError):
+    """
+    Raised when a selector isn't a valid index, CSS selector, or XPath
+    expression.
+    """
+
+
+class HTTPResponseFile(io.BytesIO):
+    """
+    The body of an HTTP response as a binary file object. The character
+    encoding declared in the response's ``Content-Type`` header, if any,
+    is available as ``charset``.
+    """
+
+    def __init__(self, content: bytes, charset: str | None):
+        super().__init__(content)
+        self.charset = charset
 
 
 def open_file_or_url(ctx: Context, param: Parameter, value: Any):
     """
     Click option callback to handle an option that can either be a local
-    file or an HTTP/HTTPS URL.
+    file or an HTTP/HTTPS URL. Returns a function that opens the file or
+    requests the URL, and returns a file object for the HTML document.
+    The function takes an optional function that creates the
+    :class:`~htmltab.fetch.Fetcher` to request URLs with, which is only
+    called (and the fetcher closed once it's been used) if the value is
+    a URL.
     """
     scheme = urllib.parse.urlparse(value).scheme
     if scheme in ("http", "https"):
-        return lambda: URL().convert(value, param, ctx).text
+        return lambda make_fetcher=None: _open_url(value, param, ctx, make_fetcher)
     else:
-        return lambda: File("rb").convert(value, param, ctx).read()
+        return lambda make_fetcher=None: File("rb").convert(value, param, ctx)
 
 
-def parse_html(html_file: str):
+def _open_url(value: Any, param: Parameter, ctx: Context, make_fetcher=None):
+    # Requests is slow to import, so it's only imported when it's needed.
+    from .fetch import response_charset
+    from .types import URL
+
+    if make_fetcher is None:
+        response = URL().convert(value, param, ctx)
+    else:
+        with make_fetcher() as fetcher:
+            response = URL(fetcher).convert(value, param, ctx)
+    return HTTPResponseFile(response.content, response_charset(response))
+
+
+def parse_html(html_file: str | bytes, encoding: str | None = None):
     """
-    Read the HTML file using lxml's HTML parser, but convert to Unicode
-    using Beautiful Soup's UnicodeDammit class.
+    Read the HTML file using lxml's HTML parser.
+
+    If the file is bytes and its character encoding can be worked out
+    cheaply (see :func:`detect_encoding`), the bytes are passed straight
+    to lxml, or decoded by Python first if lxml can't be relied on to
+    decode them (see :func:`lxml_encoding`). Otherwise the file is
+    converted to Unicode using Beautiful Soup's UnicodeDammit class,
+    which is slower but more thorough. ``encoding`` is the encoding to
+    use if the file doesn't start with a byte order mark.
 
     Can raise LxmlError or TypeError if the file can't be opened or
     parsed.
     """
-    unicode_html = UnicodeDammit(html_file, smart_quotes_to="html", is_html=True)
+    if isinstance(html_file, str):
+        with stats.timed("parse"):
+            return lxml.html.fromstring(html_file)
+    encoding = detect_encoding(html_file, encoding)
+    if encoding is not None and lxml_encoding(encoding) is not None:
+        parser = lxml.html.HTMLParser(encoding=lxml_encoding(encoding))
+        with stats.timed("parse") as metrics:
+            metrics["bytes_in"] = len(html_file)
+            return lxml.html.fromstring(html_file, parser=parser)
+    elif encoding is not None:
+        with stats.timed("decode") as metrics:
+            metrics["bytes_in"] = len(html_file)
+            unicode_markup = html_file.decode(encoding, errors="replace")
+        with stats.timed("parse"):
+            return lxml.html.fromstring(unicode_markup)
+    from bs4.dammit import UnicodeDammit
+
+    with stats.timed("decode") as metrics:
+        metrics["bytes_in"] = len(html_file)
+        unicode_html = UnicodeDammit(html_file, smart_quotes_to="html", is_html=True)
     if not unicode_html.unicode_markup:
         raise ValueError("could not detect character encoding")
-    return lxml.html.fromstring(unicode_html.unicode_markup)
+    with stats.timed("parse"):
+        return lxml.html.fromstring(unicode_html.unicode_markup)
+
+
+def parse_html_file(html_file: IO[Any], encoding: str | None = None):
+    """
+    Read and parse an HTML file object as :func:`parse_html` does, but
+    without reading the whole file into memory first if possible.
+
+    If the file is binary, starts like a whole HTML document, and its
+    character encoding can be worked out from the first few kilobytes,
+    it's passed straight to lxml's parser, which reads it a chunk at a
+    time. If lxml can't be relied on to decode it, each chunk is decoded
+    by Python before it's parsed. Otherwise the whole file is read and
+    passed to :func:`parse_html`.
+    """
+    head = html_file.read(META_SNIFF_SIZE)
+    if isinstance(head, bytes) and FULL_HTML.match(head):
+        detected = detect_encoding(head, encoding)
+        if detected is not None and lxml_encoding(detected) is not None:
+            parser = lxml.html.HTMLParser(encoding=lxml_encoding(detected))
+            prefixed = _PrefixedFile(head, html_file)
+            with stats.timed("parse") as metrics:
+                doc = lxml.html.parse(prefixed, parser).getroot()
+                metrics["bytes_in"] = prefixed.bytes_read
+            return doc
+        elif detected is not None:
+            parser = lxml.html.HTMLParser()
+            chunks = _PrefixedFile(head, html_file)
+            with stats.timed("parse") as metrics:
+                for text in decode_chunks(chunks, detected):
+                    parser.feed(text)
+                doc = parser.close()
+                metrics["bytes_in"] = chunks.bytes_read
+            return doc
+    return parse_html(head + html_file.read(), encoding)
+
+
+def decode_chunks(html_file: IO[bytes], encoding: str) -> Iterator[str]:
+    """
+    Read the binary file ``html_file`` a chunk at a time, and yield each
+    chunk decoded from ``encoding``. Characters split across chunks are
+    decoded as a whole, and bytes that aren't valid in the encoding are
+    replaced.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    while data := html_file.read(DECODE_CHUNK_SIZE):
+        if text := decoder.decode(data):
+            yield text
+    if text := decoder.decode(b"", final=True):
+        yield text
+
+
+class _PrefixedFile:
+    """
+    A binary file object that reads ``head``, the bytes already read from
+    the start of ``file``, before reading the rest of ``file``. Unlike
+    seeking back to the start, this works for pipes too.
+    """
+
+    def __init__(self, head: bytes, file: IO[bytes]):
+        self.head = head
+        self.file = file
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        if not self.head:
+            data = self.file.read(size)
+        elif size < 0:
+            data, self.head = self.head + self.file.read(), b""
+        else:
+            data, self.head = self.head[:size], self.head[size:]
+        self.bytes_read += len(data)
+        return data
+
+
+def detect_encoding(html_file: bytes, encoding: str | None = None) -> str | None:
+    """
+    Return the character encoding of the HTML file, if it can be worked
+    out without decoding the file, or ``None`` if it can't.
+
+    As in web browsers, a byte order mark at the start of the file takes
+    precedence. Otherwise ``encoding`` (e.g. the encoding given by the
+    user, or in an HTTP ``Content-Type`` header) is used if given, and
+    finally the start of the file is searched for a ``meta`` element
+    that declares the encoding.
+    """
+    if html_file.startswith((codecs.BOM_UTF32_LE, codecs.BOM_UTF32_BE)):
+        return None
+    elif html_file.startswith(codecs.BOM_UTF8):
+        return "utf-8"
+    elif html_file.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    elif encoding is None:
+        match = META_CHARSET.search(html_file, 0, META_SNIFF_SIZE)
+        if match is None:
+            return None
+        encoding = match[1].decode("ascii")
+        # A document can't declare itself to be UTF-16 from within, because
+        # it could only have been read that far if it was ASCII-compatible.
+        if encoding.lower().startswith("utf-16"):
+            return "utf-8"
+    try:
+        name = codecs.lookup(encoding).name
+    except LookupError:
+        return None
+    # Documents labelled as Latin-1 or ASCII are decoded as Windows-1252, a
+    # superset of both, as web browsers do.
+    if name in ("iso8859-1", "ascii"):
+        return "windows-1252"
+    return encoding
+
+
+def lxml_encoding(encoding: str) -> str | None:
+    """
+    Return the name to give lxml for ``encoding``, a character encoding
+    Python knows, if lxml can be relied on to decode documents in it.
+    Otherwise return ``None``, and the document must be decoded by
+    Python before it's parsed.
+    """
+    return LXML_ENCODINGS.get(codecs.lookup(encoding).name)
 
 
 def select_elements(doc: lxml.html.HtmlElement, select: str):
@@ -42,27 +270,103 @@ def select_elements(doc: lxml.html.HtmlElement, select: str):
     Return the elements within ``doc`` that match the selector
     ``select``. The selector can be an index, a CSS selector, or an
     XPath expression.
+
+    Raises:
+        :class:`InvalidSelectorError`: ``select`` is not a valid index,
+            CSS selector, or XPath expression, or it's an XPath
+            expression that evaluates to something other than elements
+    """
+    with stats.timed("select") as metrics:
+        selector = compile_selector(select)
+        try:
+            elements = selector(doc)
+        except LxmlError:
+            # Some invalid XPath expressions compile but fail when evaluated,
+            # for example if they call a function that doesn't exist.
+            raise InvalidSelectorError(
+                f"'{select}' not an index, CSS selector, or XPath expression"
+            )
+        # XPath expressions can evaluate to a number, a string, or a list of
+        # strings (e.g. text or attribute values) instead.
+        if not isinstance(elements, list) or not all(
+            map(lxml.etree.iselement, elements)
+        ):
+            raise InvalidSelectorError(f"'{select}' doesn't select elements")
+        metrics["elements"] = len(elements)
+    return elements
+
+
+@functools.lru_cache(maxsize=SELECTOR_CACHE_SIZE)
+def compile_selector(select: str) -> Callable[[lxml.html.HtmlElement], Any]:
+    """
+    Compile the selector ``select`` --- an index, a CSS selector, or an
+    XPath expression --- into a callable that takes a document and
+    returns the matching elements. Compiled selectors are cached, so
+    applying the same selector to many documents only compiles it once.
+
+    Raises:
+        :class:`InvalidSelectorError`: ``select`` is not a valid index,
+            CSS selector, or XPath expression
     """
     try:
-        int(select)
-        elements = doc.xpath(f"(//table)[{int(select)}]")
+        return lxml.etree.XPath(f"(//table)[{int(select)}]")
     except ValueError:
         # Expression wasn't a valid integer so try to use it as a CSS selector.
+        # The cssselect library is only imported when it's needed.
+        from lxml.cssselect import CSSSelector, SelectorError
+
         try:
-            elements = doc.cssselect(select)
+            return CSSSelector(select, translator="html")
         except SelectorError:
             # Nope, not a valid CSS expression. Last attempt is to try it as an
             # Path expression.
             try:
-                elements = doc.xpath(select)
+                return lxml.etree.XPath(select)
             except LxmlError:
                 # Catch the specific LXML error and raise a more generic error
                 # because the problem could lie with any of the index, CSS
                 # selector, or XPath expression.
-                raise ValueError(
+                raise InvalidSelectorError(
                     f"'{select}' not an index, CSS selector, or XPath expression"
                 )
-    return elements
+
+
+def number_parser(
+    group_symbol: str,
+    decimal_symbol: str,
+    currency_symbols: list[str],
+    cache_size: int = NUMBER_CACHE_SIZE,
+) -> Callable[[str], Decimal | None]:
+    """
+    Return a function that converts a number-like string to a
+    :class:`decimal.Decimal` object as :func:`numberise` does, but
+    returns ``None`` if the string isn't number-like. Use it to convert
+    many strings with the same settings.
+
+    Strings that can't be numbers are rejected without raising and
+    catching an exception, and the results for the ``cache_size`` most
+    recently used strings are remembered, because the same values often
+    appear many times in a column.
+    """
+    return functools.lru_cache(maxsize=cache_size)(
+        functools.partial(
+            _to_number, group_symbol, decimal_symbol, tuple(currency_symbols)
+        )
+    )
+
+
+@functools.lru_cache(maxsize=NUMBER_PARSER_CACHE_SIZE)
+def shared_number_parser(
+    group_symbol: str, decimal_symbol: str, currency_symbols: tuple[str, ...]
+) -> Callable[[str], Decimal | None]:
+    """
+    Return a function that converts number-like strings as
+    :func:`number_parser` does, shared by every table converted with the
+    same settings. The values it remembers are kept from one table to
+    the next, which helps when many documents with similar values are
+    converted in the same process.
+    """
+    return number_parser(group_symbol, decimal_symbol, list(currency_symbols))
 
 
 def numberise(
@@ -78,6 +382,8 @@ def numberise(
     symbols. It's pretty lenient, and could easily parse something as a
     number when it's not, but it's good enough.
 
+    To convert many strings, use :func:`number_parser` instead.
+
     Args:
         value: String to attempt to convert to a number
         group_symbol: symbol used to group digits in numbers (e.g. the
@@ -92,17 +398,31 @@ def numberise(
     Raises:
         :class:`ValueError`: ``value`` is not numeric
     """
+    number = _to_number(group_symbol, decimal_symbol, currency_symbols, value)
+    if number is None:
+        raise ValueError(f"{value} is not numeric")
+    return number
+
+
+def _to_number(
+    group_symbol: str,
+    decimal_symbol: str,
+    currency_symbols: Iterable[str],
+    value: str,
+) -> Decimal | None:
     number = value.strip("%")
     if len(number) > 0 and number[0] == "-":
         number = number[1:]
-        sign = Decimal("-1")
+        sign = MINUS_ONE
     else:
-        sign = Decimal("1")
+        sign = ONE
     for symbol in currency_symbols:
         number = number.strip(symbol)
     number = number.replace(group_symbol, "")
     number = number.replace(decimal_symbol, ".")
+    if not number.isdecimal() and NOT_NUMBER.search(number):
+        return None
     try:
         return Decimal(number) * sign
     except InvalidOperation:
-        raise ValueError(f"{value} is not numeric")
+        return None
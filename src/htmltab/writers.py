@@ -0,0 +1,151 @@
+"""
+Write the rows of a converted table to a file, as CSV, newline-delimited
+JSON, or Parquet. Numbers and null values keep their types in formats
+that have them, so there's no need to parse the numbers out of the CSV
+again.
+"""
+
+import csv
+import datetime
+import json
+from decimal import Decimal
+from typing import IO, Any, Callable, Iterable
+
+from .extract import Cell, Row
+from .store import RowStore
+
+# Number of rows in each row group of a Parquet file.
+PARQUET_ROW_GROUP_SIZE = 64 * 1024
+
+# Decimal columns with more significant digits than this can't be stored as
+# Arrow's ``decimal128`` type, and are stored as floating-point numbers instead.
+MAX_DECIMAL_PRECISION = 38
+
+INT64_MIN = -(2**63)
+INT64_MAX = 2**63 - 1
+
+
+def write_csv(rows: Iterable[Row], output: IO[str], delimiter: str = ","):
+    """
+    Write ``rows`` to the text file ``output`` as CSV.
+    """
+    out = csv.writer(output, delimiter=delimiter)
+    for row in rows:
+        out.writerow(row)
+
+
+def write_ndjson(rows: Iterable[Row], output: IO[str]):
+    """
+    Write ``rows`` to the text file ``output`` as newline-delimited JSON,
+    with each row as an array on its own line. Numbers are written as
+    JSON numbers, exactly as converted, and null values as ``null``.
+    """
+    for row in rows:
+        output.write("[" + ",".join(map(_json_value, row)) + "]\n")
+
+
+def write_parquet(rows: Iterable[Row], output: IO[bytes]):
+    """
+    Write ``rows`` to the binary file ``output`` as Parquet. The first
+    row is used for the names of the columns. Requires the ``pyarrow``
+    package.
+
+    Each column is given the narrowest type that fits all its values.
+    Columns that contain only numbers (and null values or empty cells)
+    are stored as 64-bit integers if every number is an integer, and as
+    decimals otherwise. Columns that contain only dates are stored as
+    dates. Any other column is stored as strings. Null
+    values are stored as nulls, and short rows are padded with nulls.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows = iter(rows)
+    header = next(rows, [])
+    body = RowStore(rows)
+    num_columns = max(body.num_columns, len(header))
+    columns = [_arrow_array(body.column(i)) for i in range(num_columns)]
+    table = pa.table(columns, names=_column_names(header, num_columns))
+    pq.write_table(table, output, row_group_size=PARQUET_ROW_GROUP_SIZE)
+
+
+# Functions that write rows in each output format. Binary formats are written
+# to a file opened in binary mode, and others to a file opened in text mode.
+WRITERS: dict[str, Callable[..., None]] = {
+    "csv": write_csv,
+    "ndjson": write_ndjson,
+    "parquet": write_parquet,
+}
+BINARY_FORMATS = frozenset({"parquet"})
+
+
+def _json_value(cell: Cell) -> str:
+    if cell is None:
+        return "null"
+    elif isinstance(cell, Decimal) and cell.is_finite():
+        return str(cell)
+    # JSON has no way to write infinity or NaN, so they're written as strings.
+    return json.dumps(str(cell), ensure_ascii=False)
+
+
+def _column_names(header: Row, num_columns: int) -> list[str]:
+    """
+    Return a unique name for each column, taken from the header row. A
+    column with no header, or the same header as an earlier column, is
+    named after its position.
+    """
+    names: list[str] = []
+    for i in range(num_columns):
+        name = "" if i >= len(header) or header[i] is None else str(header[i])
+        if not name or name in names:
+            name = f"column_{i + 1}"
+        names.append(name)
+    return names
+
+
+def _arrow_array(values: list[Cell]) -> Any:
+    """
+    Return ``values`` as an Arrow array of the narrowest type that fits
+    them.
+    """
+    import pyarrow as pa
+
+    dates = [value for value in values if isinstance(value, datetime.date)]
+    numbers = [value for value in values if isinstance(value, Decimal)]
+    if dates and not numbers and not any(isinstance(v, str) and v for v in values):
+        return pa.array(
+            [value if isinstance(value, datetime.date) else None for value in values],
+            pa.date32(),
+        )
+    if not numbers or any(
+        isinstance(value, (str, datetime.date)) and value for value in values
+    ):
+        return pa.array(
+            [None if value is None else str(value) for value in values], pa.string()
+        )
+    # Null values and empty cells in numeric columns become nulls.
+    cells = [value if isinstance(value, Decimal) else None for value in values]
+    if not all(number.is_finite() for number in numbers):
+        return pa.array(
+            [None if cell is None else float(cell) for cell in cells], pa.float64()
+        )
+    exponents = [int(number.as_tuple().exponent) for number in numbers]
+    if min(exponents) >= 0 and all(
+        INT64_MIN <= number <= INT64_MAX for number in numbers
+    ):
+        return pa.array(
+            [None if cell is None else int(cell) for cell in cells], pa.int64()
+        )
+    # The precision of a decimal column is the number of digits needed for the
+    # largest integer part plus the number needed for the longest fraction.
+    scale = max(0, -min(exponents))
+    integer_digits = max(
+        max(0, len(number.as_tuple().digits) + exponent)
+        for number, exponent in zip(numbers, exponents)
+    )
+    precision = max(1, integer_digits + scale)
+    if precision > MAX_DECIMAL_PRECISION:
+        return pa.array(
+            [None if cell is None else float(cell) for cell in cells], pa.float64()
+        )
+    return pa.array(cells, pa.decimal128(precision, scale))
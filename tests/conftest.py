@@ -1,3 +1,6 @@
+import http.server
+import threading
+
 import click.testing
 import pytest
 
@@ -68,3 +71,71 @@ def ragged_csv():
     with open("tests/fixtures/ragged.csv") as fh:
         file_contents = fh.read()
     return file_contents
+
+
+@pytest.fixture(scope="session")
+def rowspan_csv():
+    with open("tests/fixtures/rowspan.csv") as fh:
+        file_contents = fh.read()
+    return file_contents
+
+
+class FixtureRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serve the HTML files in ``tests/fixtures``, and a handful of paths
+    that fail in different ways.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if self.path == "/flaky.html" and self.server.requests.count(self.path) == 1:
+            self.send_error(503)
+        elif (
+            self.path == "/cached.html"
+            and self.headers.get("If-None-Match") == self.server.etag
+        ):
+            self.send_response(304)
+            self.send_header("ETag", self.server.etag)
+            self.end_headers()
+        elif self.path in ("/basic.html", "/three.html", "/flaky.html", "/cached.html"):
+            filename = "three.html" if self.path == "/three.html" else "basic.html"
+            with open(f"tests/fixtures/{filename}", "rb") as fh:
+                body = fh.read()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            if self.path == "/cached.html":
+                self.send_header("ETag", self.server.etag)
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    """
+    Run a local HTTP server in a background thread, serving HTML
+    fixtures. The server's base URL is available as ``server.url``.
+    """
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FixtureRequestHandler)
+    server.url = f"http://127.0.0.1:{server.server_port}"
+    server.requests = []
+    server.connections = 0
+    server.etag = '"v1"'
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
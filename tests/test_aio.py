@@ -0,0 +1,76 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+import requests
+from httmock import HTTMock, all_requests
+
+import htmltab
+from htmltab import aextract_table, extract_table
+
+
+@all_requests
+def basic_response(url, request):
+    with open("tests/fixtures/basic.html", "rb") as fh:
+        return {"status_code": 200, "content": fh.read()}
+
+
+@all_requests
+def response_404(url, request):
+    return {"status_code": 404, "reason": "NOT FOUND"}
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=1)
+        self.calls = 0
+
+    def submit(self, *args, **kwargs):
+        self.calls += 1
+        return super().submit(*args, **kwargs)
+
+
+async def collect(source, **kwargs):
+    rows = await aextract_table(source, **kwargs)
+    return [row async for row in rows]
+
+
+def test_aextract_table():
+    path = Path("tests/fixtures/three.html")
+    expected = list(extract_table(path, "2"))
+    assert asyncio.run(collect(path, select="2")) == expected
+    with CountingExecutor() as executor:
+        rows = asyncio.run(collect(path, select="2", executor=executor, batch_size=4))
+    assert rows == expected
+    # One call to parse the document, and one for each batch of rows: four
+    # rows, two rows, and the empty batch that ends the rows.
+    assert len(expected) == 6
+    assert executor.calls == 4
+
+
+def test_aextract_table_stream():
+    with open("tests/fixtures/basic.html", "rb") as fh:
+        expected = list(extract_table(fh.read()))
+    with open("tests/fixtures/basic.html", "rb") as fh:
+        assert asyncio.run(collect(fh, stream=True, batch_size=1)) == expected
+
+
+def test_aextract_table_url():
+    with open("tests/fixtures/basic.html", "rb") as fh:
+        expected = list(extract_table(fh.read()))
+    with HTTMock(basic_response):
+        assert asyncio.run(collect("http://example.org/basic.html")) == expected
+    with HTTMock(response_404), pytest.raises(requests.HTTPError):
+        asyncio.run(collect("http://example.org/missing.html"))
+
+
+def test_aextract_table_errors():
+    with pytest.raises(ValueError):
+        asyncio.run(aextract_table("<table><tr><td>1</td></tr></table>", "2"))
+
+
+def test_aextract_table_is_lazily_imported():
+    assert "aextract_table" in htmltab.__all__
+    with pytest.raises(AttributeError):
+        htmltab.no_such_function
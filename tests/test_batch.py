@@ -0,0 +1,146 @@
+import shutil
+
+from htmltab.batch import main
+from htmltab.cli import main as cli_main
+
+
+def test_batch(runner, tmp_path, basic_csv, three_csv_table_one):
+    output_dir = tmp_path / "csv"
+    result = runner.invoke(
+        main,
+        ["--output-dir", str(output_dir), "--jobs", "2"]
+        + ["tests/fixtures/basic.html", "tests/fixtures/three.html"],
+    )
+    assert result.exit_code == 0
+    assert (output_dir / "basic.csv").read_text() == basic_csv
+    assert (output_dir / "three.csv").read_text() == three_csv_table_one
+
+
+def test_batch_directory_and_manifest(runner, tmp_path, basic_csv):
+    pages = tmp_path / "pages"
+    (pages / "sub").mkdir(parents=True)
+    shutil.copy("tests/fixtures/basic.html", pages / "a.html")
+    shutil.copy("tests/fixtures/basic.html", pages / "sub" / "b.htm")
+    (pages / "notes.txt").write_text("not HTML")
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("tests/fixtures/ragged.html\n\n")
+    output_dir = tmp_path / "csv"
+    result = runner.invoke(
+        main,
+        ["-O", str(output_dir), "-j", "1", "--manifest", str(manifest), str(pages)],
+    )
+    assert result.exit_code == 0
+    # Documents in directories are written relative to the directory searched.
+    assert sorted(
+        p.relative_to(output_dir).as_posix() for p in output_dir.rglob("*.csv")
+    ) == ["a.csv", "ragged.csv", "sub/b.csv"]
+    assert (output_dir / "sub" / "b.csv").read_text() == basic_csv
+
+
+def test_batch_reports_errors(runner, tmp_path, three_csv_table_three):
+    output_dir = tmp_path / "csv"
+    result = runner.invoke(
+        main,
+        ["-O", str(output_dir), "-j", "1", "-s", "3"]
+        + ["tests/fixtures/basic.html", "missing.html", "tests/fixtures/three.html"],
+    )
+    assert result.exit_code == 1
+    assert "tests/fixtures/basic.html: value matched no elements" in result.output
+    assert "missing.html: [Errno 2] No such file or directory" in result.output
+    assert "Failed to convert 2 of 3 documents" in result.output
+    assert (output_dir / "three.csv").read_text() == three_csv_table_three
+
+
+def test_batch_output_collision(runner, tmp_path):
+    result = runner.invoke(
+        main, ["-O", str(tmp_path), "tests/fixtures/basic.html", "basic.htm"]
+    )
+    assert result.exit_code != 0
+    assert "would both be written to" in result.output
+
+
+def test_batch_same_filename_in_subdirectories(runner, tmp_path, basic_csv):
+    pages = tmp_path / "pages"
+    for name in ("a", "b"):
+        (pages / name).mkdir(parents=True)
+        shutil.copy("tests/fixtures/basic.html", pages / name / "index.html")
+    output_dir = tmp_path / "csv"
+    result = runner.invoke(main, ["-O", str(output_dir), "-j", "1", str(pages)])
+    assert result.exit_code == 0
+    assert (output_dir / "a" / "index.csv").read_text() == basic_csv
+    assert (output_dir / "b" / "index.csv").read_text() == basic_csv
+    result2 = runner.invoke(
+        main, ["-O", str(output_dir), "-j", "1", f"{pages}/*/index.html"]
+    )
+    assert result2.exit_code == 0
+
+
+def test_batch_overlapping_inputs(runner, tmp_path, basic_csv):
+    pages = tmp_path / "pages"
+    pages.mkdir()
+    shutil.copy("tests/fixtures/basic.html", pages / "basic.html")
+    output_dir = tmp_path / "csv"
+    result = runner.invoke(
+        main,
+        ["-O", str(output_dir), "-j", "1", str(pages / "basic.html")]
+        + [f"{pages}/*.html", f"{pages}/../pages/basic.html"],
+    )
+    assert result.exit_code == 0
+    assert [p.name for p in output_dir.iterdir()] == ["basic.csv"]
+    assert (output_dir / "basic.csv").read_text() == basic_csv
+
+
+def test_batch_urls(runner, tmp_path, http_server, basic_csv):
+    output_dir = tmp_path / "csv"
+    result = runner.invoke(
+        main,
+        ["-O", str(output_dir), "-j", "1", "--retries", "0"]
+        + [f"{http_server.url}/basic.html", f"{http_server.url}/404.html"],
+    )
+    assert result.exit_code == 1
+    assert f"HTTP 404 Not Found ({http_server.url}/404.html)" in result.output
+    [csv_file] = output_dir.iterdir()
+    assert csv_file.name == f"127.0.0.1_{http_server.server_port}_basic.csv"
+    assert csv_file.read_text() == basic_csv
+
+
+def test_batch_urls_in_worker_processes(
+    runner, tmp_path, recwarn, http_server, basic_csv
+):
+    output_dir = tmp_path / "csv"
+    result = runner.invoke(
+        main,
+        ["-O", str(output_dir), "-j", "2", "--retries", "0"]
+        + [f"{http_server.url}/basic.html", f"{http_server.url}/cached.html"],
+    )
+    assert result.exit_code == 0, result.output
+    assert sorted(p.name for p in output_dir.iterdir()) == [
+        f"127.0.0.1_{http_server.server_port}_basic.csv",
+        f"127.0.0.1_{http_server.server_port}_cached.csv",
+    ]
+    for csv_file in output_dir.iterdir():
+        assert csv_file.read_text() == basic_csv
+    # Forking while URLs are downloaded in other threads could deadlock.
+    assert not [w for w in recwarn if "fork()" in str(w.message)]
+
+
+def test_batch_result_cache(runner, tmp_path, monkeypatch, basic_csv):
+    cache_dir = str(tmp_path / "results")
+    cli_result = runner.invoke(
+        cli_main, ["--result-cache-dir", cache_dir, "tests/fixtures/basic.html"]
+    )
+    assert cli_result.exit_code == 0
+
+    # Output cached by htmltab is reused by htmltab-batch.
+    def fail(*args, **kwargs):
+        raise AssertionError("document converted again")
+
+    monkeypatch.setattr("htmltab.batch.extract_table", fail)
+    output_dir = tmp_path / "csv"
+    result = runner.invoke(
+        main,
+        ["--output-dir", str(output_dir), "--jobs", "1"]
+        + ["--result-cache-dir", cache_dir, "tests/fixtures/basic.html"],
+    )
+    assert result.exit_code == 0
+    assert (output_dir / "basic.csv").read_text() == basic_csv
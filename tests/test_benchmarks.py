@@ -0,0 +1,39 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+BENCHMARKS = Path(__file__).parent.parent / "benchmarks"
+
+
+def test_bench_stages(tmp_path):
+    """
+    The benchmark suite runs, saves its results, and compares them
+    against a baseline. The tables are tiny, so this only checks that the
+    suite hasn't been broken by changes to the code it benchmarks.
+    """
+    baseline = tmp_path / "baseline.json"
+    command = [
+        sys.executable,
+        str(BENCHMARKS / "bench_stages.py"),
+        "--scale",
+        "0.001",
+        "--repeat",
+        "1",
+    ]
+    subprocess.run(command + ["--save", str(baseline)], check=True)
+    results = json.loads(baseline.read_text())
+    assert set(results["results"]) == {
+        f"{table}/{stage}"
+        for table in ("wide", "tall", "nested", "colspan", "numeric", "text")
+        for stage in ("parse", "select", "convert", "write")
+    }
+    # Timings this short are too noisy to compare, so allow any slowdown.
+    result = subprocess.run(
+        command + ["--compare", str(baseline), "--tolerance", "1000000"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert "wide/parse" in result.stdout
+    assert "REGRESSED" not in result.stdout
@@ -1,10 +1,14 @@
+import codecs
+import io
+import json
 from decimal import Decimal
 
 import pytest
 from httmock import HTTMock, all_requests
 
+from htmltab import extract_table
 from htmltab.cli import main
-from htmltab.utils import numberise
+from htmltab.utils import detect_encoding, number_parser, numberise
 
 
 @all_requests
@@ -73,6 +77,14 @@ def test_invalid_select_value(runner):
     assert "Error: Invalid value: '!'" in result.output
 
 
+@pytest.mark.parametrize("select", ["count(//table)", "name(//table)", "//td/text()"])
+def test_select_value_not_elements(runner, select):
+    result = runner.invoke(main, ["-s", select, "tests/fixtures/three.html"])
+    assert result.exit_code != 0
+    assert f"'{select}' doesn't select elements" in result.output
+    assert "could not parse HTML" not in result.output
+
+
 def test_table_rows_required(runner):
     result = runner.invoke(main, ["-s", "#data", "tests/fixtures/three.html"])
     assert result.exit_code != 0
@@ -97,6 +109,17 @@ def test_all_rows_are_same_length(runner, ragged_csv):
     assert result.output == ragged_csv
 
 
+def test_rowspan(runner, rowspan_csv):
+    result = runner.invoke(main, ["tests/fixtures/rowspan.html"])
+    assert result.exit_code == 0
+    assert result.output == rowspan_csv
+    result2 = runner.invoke(
+        main, ["--stream", "--columns", "3", "tests/fixtures/rowspan.html"]
+    )
+    assert result2.exit_code == 0
+    assert result2.output == rowspan_csv
+
+
 def test_default_null_values(runner):
     result = runner.invoke(main, ["tests/fixtures/countries.html"])
     with open("tests/fixtures/countries_default_nulls.csv") as fh:
@@ -172,6 +195,127 @@ def test_delimiter_must_be_single_character(runner):
     assert "Error: delimiter must be a single character" in result.output
 
 
+def test_format_ndjson(runner):
+    result = runner.invoke(
+        main, ["-f", "ndjson", "-s", "2", "tests/fixtures/three.html"]
+    )
+    assert result.exit_code == 0
+    assert result.output.splitlines() == [
+        '["Column 1","Column 2"]',
+        '["ABC","DEF"]',
+        '["GHI","JKL"]',
+        '["na",null]',
+        "[5000,6.345]",
+        '["Total",100.0]',
+    ]
+
+
+def test_format_parquet(runner, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    html = (
+        "<table><tr><th>Name</th><th>Count</th><th>Price</th><th></th></tr>"
+        "<tr><td>A</td><td>1,000</td><td>€1.5</td><td>x</td></tr>"
+        "<tr><td>B</td><td>-</td><td>20</td></tr></table>"
+    )
+    result = runner.invoke(main, ["--format", "parquet"], input=html)
+    assert result.exit_code == 0
+    (tmp_path / "table.parquet").write_bytes(result.stdout_bytes)
+    table = pq.read_table(tmp_path / "table.parquet")
+    assert [str(field.type) for field in table.schema] == [
+        "string",
+        "int64",
+        "decimal128(3, 1)",
+        "string",
+    ]
+    assert table.to_pylist() == [
+        {"Name": "A", "Count": 1000, "Price": Decimal("1.5"), "column_4": "x"},
+        {"Name": "B", "Count": None, "Price": Decimal("20.0"), "column_4": None},
+    ]
+    result2 = runner.invoke(
+        main,
+        [
+            "-f",
+            "parquet",
+            "--all-tables",
+            "--output-template",
+            str(tmp_path / "{n}.pq"),
+        ],
+        input=html,
+    )
+    assert result2.exit_code == 0
+    assert pq.read_table(tmp_path / "1.pq") == table
+
+
+def test_infer_types(runner):
+    html = (
+        "<table><tr><th>Code</th><th>Total</th></tr>"
+        "<tr><td>007</td><td>$1,000</td></tr>"
+        "<tr><td>X1</td><td>$2.5</td></tr></table>"
+    )
+    result = runner.invoke(main, ["--format", "ndjson", "--infer-types"], input=html)
+    assert result.exit_code == 0
+    assert result.output.splitlines() == [
+        '["Code","Total"]',
+        '["007",1000]',
+        '["X1",2.5]',
+    ]
+
+
+def test_limit_and_offset(runner, basic_csv):
+    result = runner.invoke(
+        main, ["--offset", "1", "--limit", "2", "tests/fixtures/basic.html"]
+    )
+    assert result.exit_code == 0
+    assert result.output.splitlines() == basic_csv.splitlines()[1:3]
+    result2 = runner.invoke(main, ["--limit", "0", "tests/fixtures/basic.html"])
+    assert result2.exit_code == 0
+    assert result2.output == ""
+
+
+def test_limit_stops_reading_when_streaming(runner):
+    html = io.BytesIO(
+        b"<table>" + b"<tr><td>1</td></tr>" * 100_000 + b"</table>" + b"x" * 100_000
+    )
+    result = runner.invoke(main, ["--stream", "--limit", "3"], input=html)
+    assert result.exit_code == 0
+    assert result.output == "1\n1\n1\n"
+    assert html.tell() < len(html.getvalue()) / 10
+
+
+def test_profile(runner, basic_csv):
+    result = runner.invoke(main, ["--profile", "tests/fixtures/basic.html"])
+    assert result.exit_code == 0
+    assert result.stdout == basic_csv
+    profile = json.loads(result.stderr)
+    assert list(profile["stages"]) == ["parse", "select", "convert", "write"]
+    assert profile["stages"]["write"]["rows"] == len(basic_csv.splitlines())
+    # The CSV writer ends lines with "\r\n", which the test runner normalises.
+    csv_bytes = basic_csv.replace("\n", "\r\n").encode()
+    assert profile["stages"]["write"]["bytes_out"] == len(csv_bytes)
+    assert profile["peak_rss"] > 0
+
+
+def test_result_cache(runner, tmp_path, monkeypatch, basic_csv):
+    cache_dir = str(tmp_path / "results")
+    args = ["--result-cache-dir", cache_dir, "tests/fixtures/basic.html"]
+    result = runner.invoke(main, args)
+    assert result.exit_code == 0
+    assert result.output == basic_csv
+
+    # The second time round, the output comes from the cache.
+    def fail(*args, **kwargs):
+        raise AssertionError("document converted again")
+
+    monkeypatch.setattr("htmltab.cli.extract_table", fail)
+    result = runner.invoke(main, args)
+    assert result.exit_code == 0
+    assert result.output == basic_csv
+
+    # Different options have a different entry.
+    result = runner.invoke(main, ["--keep-numbers"] + args)
+    assert result.exit_code != 0
+
+
 def test_bad_input(runner):
     result = runner.invoke(main, input="<")
     assert result.exit_code != 0
@@ -245,3 +389,208 @@ def test_numberise():
 
     assert Decimal("-1357.91") == numberise("-1.357,91", ".", ",", currency_symbols)
     assert Decimal("1357.91") == numberise("1.357,91", ".", ",", currency_symbols)
+
+
+def test_number_parser():
+    parse_number = number_parser(",", ".", ["€", "$"])
+    for value in ["1", "-1,357.91", "€-1.23", "50%", "1e3", "NaN", "-0"]:
+        assert str(parse_number(value)) == str(numberise(value, ",", ".", ["€", "$"]))
+    for value in ["A", "Route 66", "1.2.3", "sNaN", ""]:
+        assert parse_number(value) is None
+    assert parse_number("1,000") is parse_number("1,000")
+
+
+def test_stream(runner, three_csv_table_three, basic_csv):
+    result = runner.invoke(main, ["--stream", "-s", "3", "tests/fixtures/three.html"])
+    assert result.exit_code == 0
+    assert result.output == three_csv_table_three
+    result2 = runner.invoke(main, ["--stream", "tests/fixtures/basic.html"])
+    assert result2.exit_code == 0
+    assert result2.output == basic_csv
+
+
+def test_jobs(runner, monkeypatch, basic_csv):
+    monkeypatch.setattr("htmltab.parallel.CHUNK_ROWS", 2)
+    result = runner.invoke(main, ["--jobs", "2", "tests/fixtures/basic.html"])
+    assert result.exit_code == 0
+    assert result.output == basic_csv
+    result2 = runner.invoke(main, ["-j", "0", "tests/fixtures/basic.html"])
+    assert result2.exit_code != 0
+
+
+def test_stream_css_select_value(runner):
+    html = '<table class="a"><tr><td>1</td></tr></table><table id="b" class="a c">'
+    html += "<tr><td>2</td></tr></table>"
+    result = runner.invoke(main, ["--stream", "-s", "table.a.c"], input=html)
+    assert result.exit_code == 0
+    assert result.output == "2\n"
+    result2 = runner.invoke(main, ["--stream", "-s", "#b"], input=html)
+    assert result2.output == "2\n"
+    result3 = runner.invoke(main, ["--stream", "-s", "table#c"], input=html)
+    assert result3.exit_code != 0
+    assert "Error: value matched no elements" in result3.output
+
+
+def test_stream_unsupported_select_value(runner):
+    result = runner.invoke(
+        main, ["--stream", "-s", "#data table", "tests/fixtures/three.html"]
+    )
+    assert result.exit_code != 0
+    assert "can't be used when streaming" in result.output
+
+
+def test_stream_nested_table(runner):
+    html = "<table><tr><td>A</td><td><table><tr><td>B</td></tr></table></td></tr>"
+    html += "<tr><td>C</td><td>D</td></tr></table>"
+    result = runner.invoke(main, ["--stream"], input=html)
+    assert result.exit_code == 0
+    assert result.output == "A,B\nC,D\n"
+
+
+def test_no_pad(runner):
+    result = runner.invoke(main, ["--no-pad", "tests/fixtures/ragged.html"])
+    assert result.exit_code == 0
+    assert (
+        result.output == "1,2\n1,2,3,4\n1,2,3\n1,2,3,4,5,6\n1,2,3,4,5,6\n1,1,1,1\n1\n"
+    )
+
+
+def test_columns(runner, ragged_csv):
+    result = runner.invoke(main, ["--columns", "6", "tests/fixtures/ragged.html"])
+    assert result.exit_code == 0
+    assert result.output == ragged_csv
+    result2 = runner.invoke(main, ["--columns", "3", "tests/fixtures/ragged.html"])
+    assert result2.output.splitlines()[:3] == ["1,2,", "1,2,3,4", "1,2,3"]
+    result3 = runner.invoke(
+        main, ["--stream", "--columns", "6", "tests/fixtures/ragged.html"]
+    )
+    assert result3.output == ragged_csv
+    result4 = runner.invoke(main, ["--columns", "0", "tests/fixtures/ragged.html"])
+    assert result4.exit_code != 0
+
+
+def test_all_tables(runner, tmp_path, three_csv_table_one, three_csv_table_three):
+    template = str(tmp_path / "table-{n}.csv")
+    result = runner.invoke(
+        main,
+        ["--all-tables", "--output-template", template, "tests/fixtures/three.html"],
+    )
+    assert result.exit_code == 0
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "table-1.csv",
+        "table-2.csv",
+        "table-3.csv",
+    ]
+    assert (tmp_path / "table-1.csv").read_text() == three_csv_table_one
+    assert (tmp_path / "table-3.csv").read_text() == three_csv_table_three
+
+
+def test_multiple_select_values(runner, tmp_path, three_csv_table_two):
+    template = str(tmp_path / "{n}.csv")
+    result = runner.invoke(
+        main,
+        ["-s", "3", "-s", "#data table", "--output-template", template]
+        + ["tests/fixtures/three.html"],
+    )
+    assert result.exit_code == 0
+    assert (tmp_path / "2.csv").read_text() == three_csv_table_two
+
+
+def test_output_template_required(runner, tmp_path):
+    result = runner.invoke(main, ["--all-tables", "tests/fixtures/three.html"])
+    assert result.exit_code != 0
+    assert "Error: --output-template is required" in result.output
+    result2 = runner.invoke(
+        main,
+        ["--all-tables", "--output-template", str(tmp_path / "out.csv")]
+        + ["tests/fixtures/three.html"],
+    )
+    assert result2.exit_code != 0
+    assert "must contain '{n}'" in result2.output
+    result3 = runner.invoke(
+        main, ["--output-template", "{x}.csv", "tests/fixtures/three.html"]
+    )
+    assert result3.exit_code != 0
+    assert "Invalid value for '--output-template'" in result3.output
+
+
+def test_cache_dir(runner, tmp_path, http_server, basic_csv):
+    url = f"{http_server.url}/cached.html"
+    for _ in range(2):
+        result = runner.invoke(main, ["--cache-dir", str(tmp_path), url])
+        assert result.exit_code == 0
+        assert result.output == basic_csv
+    assert len(list(tmp_path.glob("*.data"))) == 1
+
+
+def test_cache_dir_local_file(runner, tmp_path, monkeypatch, basic_csv):
+    def fail(*args, **kwargs):
+        raise AssertionError("fetcher created for a local file")
+
+    monkeypatch.setattr("htmltab.cli.make_fetcher", fail)
+    cache_dir = tmp_path / "cache"
+    args = ["--cache-dir", str(cache_dir)]
+    result = runner.invoke(main, args + ["tests/fixtures/basic.html"])
+    assert result.exit_code == 0
+    assert result.output == basic_csv
+    with open("tests/fixtures/basic.html") as fh:
+        result = runner.invoke(main, args, input=fh.read())
+    assert result.exit_code == 0
+    assert result.output == basic_csv
+    assert not cache_dir.exists()
+
+
+def test_encoding(runner):
+    html = "<table><tr><td>Caf\xe9</td><td>\x93quoted\x94</td></tr></table>"
+    html = html.encode("latin-1")
+    result = runner.invoke(main, ["--encoding", "windows-1252"], input=html)
+    assert result.exit_code == 0
+    assert result.output == "Café,“quoted”\n"
+    result3 = runner.invoke(main, ["--encoding", "foo"], input=html)
+    assert result3.exit_code != 0
+    assert "unknown encoding 'foo'" in result3.output
+
+
+@pytest.mark.parametrize(
+    "charset, codec, text",
+    [("ks_c_5601-1987", "euc_kr", "한국"), ("mac-roman", "mac_roman", "Café")],
+)
+def test_encoding_unknown_to_lxml(runner, tmp_path, charset, codec, text):
+    # libxml2 doesn't know these encodings, and would parse nothing at all.
+    html = f"<html><head><meta charset='{charset}'></head><body>"
+    html += f"<table><tr><td>{text}</td></tr></table></body></html>"
+    path = tmp_path / "table.html"
+    path.write_bytes(html.encode(codec))
+    result = runner.invoke(main, [str(path)])
+    assert result.exit_code == 0
+    assert result.output == text + "\n"
+    result2 = runner.invoke(main, ["--stream", str(path)])
+    assert result2.exit_code == 0
+    assert result2.output == text + "\n"
+    result3 = runner.invoke(main, input=html.encode(codec))
+    assert result3.output == text + "\n"
+    assert list(extract_table(html.encode(codec))) == [[text]]
+
+
+def test_detect_encoding():
+    meta = b'<html><head><meta charset="Shift_JIS"></head></html>'
+    assert detect_encoding(meta) == "Shift_JIS"
+    http_equiv = b"<meta http-equiv=Content-Type content='text/html; charset=latin1'>"
+    assert detect_encoding(http_equiv) == "windows-1252"
+    assert detect_encoding(meta, "utf-8") == "utf-8"
+    assert detect_encoding(codecs.BOM_UTF8 + meta, "latin-1") == "utf-8"
+    assert detect_encoding(codecs.BOM_UTF16_LE + meta) == "utf-16"
+    assert detect_encoding(b"<meta charset=utf-16>") == "utf-8"
+    assert detect_encoding(b"<table></table>") is None
+    assert detect_encoding(b"<meta charset=nonsense>") is None
+
+
+def test_list(runner):
+    result = runner.invoke(main, ["--list", "tests/fixtures/three.html"])
+    assert result.exit_code == 0
+    tables = [json.loads(line) for line in result.output.splitlines()]
+    assert [table["index"] for table in tables] == [1, 2, 3]
+    assert tables[1]["xpath"] == "(//table)[2]"
+    assert tables[1]["rows"] == 6
+    assert tables[1]["columns"] == 2
+    assert tables[1]["header"] == ["Column 1", "Column 2"]
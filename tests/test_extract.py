@@ -0,0 +1,187 @@
+import io
+from decimal import Decimal
+from pathlib import Path
+
+import lxml.html
+import pytest
+
+from htmltab import InvalidSelectorError, extract_table, list_tables
+from htmltab.utils import compile_selector, select_elements
+
+
+def test_extract_table():
+    rows = extract_table(Path("tests/fixtures/three.html"), "2")
+    assert list(rows) == [
+        ["Column 1", "Column 2"],
+        ["ABC", "DEF"],
+        ["GHI", "JKL"],
+        ["na", None],
+        [Decimal("5000"), Decimal("6.345")],
+        ["Total", Decimal("100.0")],
+    ]
+
+
+def test_extract_table_sources():
+    with open("tests/fixtures/basic.html", "rb") as fh:
+        html = fh.read()
+    expected = list(extract_table(html))
+    assert list(extract_table(html.decode("utf-8"))) == expected
+    assert list(extract_table(lxml.html.fromstring(html))) == expected
+    with open("tests/fixtures/basic.html", "rb") as fh:
+        assert list(extract_table(fh)) == expected
+    with open("tests/fixtures/basic.html", "rb") as fh:
+        assert list(extract_table(fh, stream=True)) == expected
+
+
+def test_extract_table_file_is_not_read_into_memory(monkeypatch):
+    def read_whole_file(*args, **kwargs):
+        raise AssertionError("whole file read into memory")
+
+    with open("tests/fixtures/basic.html", "rb") as fh:
+        expected = list(extract_table(fh.read()))
+    monkeypatch.setattr("htmltab.utils.parse_html", read_whole_file)
+    assert list(extract_table(Path("tests/fixtures/basic.html"))) == expected
+    with open("tests/fixtures/basic.html", "rb") as fh:
+        assert list(extract_table(io.BufferedReader(io.BytesIO(fh.read())))) == expected
+
+
+def test_extract_table_options():
+    html = "<table><tr><td>1.000,5 kr</td><td>NA</td><td>-</td></tr></table>"
+    rows = extract_table(
+        html,
+        null_values=["-"],
+        group_symbol=".",
+        decimal_symbol=",",
+        currency_symbols=[" kr"],
+    )
+    assert list(rows) == [[Decimal("1000.5"), "NA", None]]
+    rows = extract_table(html, convert_numbers=False)
+    assert list(rows) == [["1.000,5 kr", None, None]]
+
+
+def test_extract_table_is_lazy():
+    html = "<table>" + "<tr><td>1</td></tr>" * 3 + "<tr><td>x</td></tr></table>"
+    rows = extract_table(html)
+    assert next(rows) == [Decimal("1")]
+
+
+def test_extract_table_errors():
+    with pytest.raises(InvalidSelectorError):
+        extract_table(Path("tests/fixtures/three.html"), "!")
+    with pytest.raises(ValueError, match="value matched no elements"):
+        extract_table(Path("tests/fixtures/three.html"), "4")
+    # Compiles as XPath, but fails when evaluated.
+    with pytest.raises(InvalidSelectorError):
+        extract_table(Path("tests/fixtures/three.html"), "nosuchfunction()")
+
+
+def test_compile_selector_is_cached():
+    assert compile_selector("table#data") is compile_selector("table#data")
+    assert compile_selector("2") is compile_selector("2")
+    doc = lxml.html.fromstring(
+        "<div><table id='data'><tr><td>1</td></tr></table></div>"
+    )
+    assert [el.get("id") for el in select_elements(doc, "table#data")] == ["data"]
+    assert [el.get("id") for el in select_elements(doc, "//table[@id]")] == ["data"]
+
+
+LIST_TABLES_HTML = """
+<table id="outer" class="stats wide">
+  <caption> Sales  by region </caption>
+  <tr><th colspan="2">Region</th><th>Sales</th></tr>
+  <tr><td rowspan="2">North</td><td>A</td><td>1</td></tr>
+  <tr><td>B</td><td>2</td><td>x</td></tr>
+  <tr><td>Inner: <table><tr><td></td></tr><tr><td>In</td></tr></table></td></tr>
+</table>
+<table id="not simple"><tr><td>Last</td></tr></table>
+"""
+
+
+def test_list_tables():
+    tables = list(list_tables(LIST_TABLES_HTML))
+    assert tables == [
+        {
+            "index": 1,
+            "id": "outer",
+            "class": ["stats", "wide"],
+            "css": "table#outer",
+            "xpath": "(//table)[1]",
+            "depth": 0,
+            "caption": "Sales by region",
+            "rows": 4,
+            "columns": 4,
+            "header": ["Region", "Region", "Sales"],
+        },
+        {
+            "index": 2,
+            "id": None,
+            "class": [],
+            "css": None,
+            "xpath": "(//table)[2]",
+            "depth": 1,
+            "caption": None,
+            "rows": 2,
+            "columns": 1,
+            "header": ["In"],
+        },
+        {
+            "index": 3,
+            "id": "not simple",
+            "class": [],
+            "css": None,
+            "xpath": "(//table)[3]",
+            "depth": 0,
+            "caption": None,
+            "rows": 1,
+            "columns": 1,
+            "header": ["Last"],
+        },
+    ]
+    # Parsed documents are walked rather than parsed, and left as they were.
+    doc = lxml.html.fromstring(LIST_TABLES_HTML)
+    assert list(list_tables(doc)) == tables
+    assert len(doc.xpath("//tr")) == 7
+
+
+def test_list_tables_selectors():
+    path = Path("tests/fixtures/three.html")
+    for table in list_tables(path):
+        expected = list(extract_table(path, str(table["index"])))
+        assert list(extract_table(path, table["xpath"])) == expected
+        assert table["header"] == expected[0]
+
+
+PARALLEL_HTML = """
+<table>
+  <thead><tr><th rowspan="2">A</th><th>B</th></tr><tr><th>C</th></tr></thead>
+  <tbody>
+    {rows}
+    <tr><td rowspan="4">Span</td><td>1</td></tr>
+    <tr><td>2</td></tr>
+    <tr><td></td></tr>
+    <tr><td>-</td></tr>
+    <tr><td rowspan="0">All</td><td>x</td></tr>
+    <tr><td><table><tr><td>Inner</td></tr></table></td></tr>
+  </tbody>
+  <tbody><tr><td>Last &amp; final</td><td colspan="2">1,000</td></tr></tbody>
+</table>
+"""
+
+
+def test_extract_table_jobs(monkeypatch):
+    html = PARALLEL_HTML.format(
+        rows="".join(f"<tr><td>{i}</td><td>Row {i}</td></tr>" for i in range(20))
+    )
+    expected = list(extract_table(html))
+    # Small chunks, so that cells span rows across the end of chunks, including
+    # the first chunk (which is converted without a worker process).
+    for chunk_rows in (3, 23):
+        monkeypatch.setattr("htmltab.parallel.CHUNK_ROWS", chunk_rows)
+        assert list(extract_table(html, jobs=2)) == expected
+        assert list(extract_table(html, stream=True, jobs=2)) == expected
+    # A table that fits in one chunk is converted without worker processes, or
+    # serializing its rows.
+    monkeypatch.setattr("htmltab.parallel.CHUNK_ROWS", 1000)
+    monkeypatch.setattr("htmltab.parallel.ProcessPoolExecutor", None)
+    monkeypatch.setattr("htmltab.parallel._chunks", None)
+    assert list(extract_table(html, jobs=2)) == expected
@@ -0,0 +1,74 @@
+import hashlib
+import os
+
+import requests
+
+from htmltab.cache import DiskCache
+from htmltab.fetch import Fetcher, describe_error
+from htmltab.types import URL
+
+
+def test_fetch_all(http_server):
+    urls = [f"{http_server.url}/basic.html", f"{http_server.url}/three.html"] * 5
+    with Fetcher(concurrency=4, per_host=2) as fetcher:
+        results = list(fetcher.fetch_all(urls))
+    assert sorted(url for url, _ in results) == sorted(urls)
+    assert all(response.status_code == 200 for _, response in results)
+    # Connections are kept alive and reused rather than opened per request.
+    assert http_server.connections <= 2
+
+
+def test_fetch_retries(http_server):
+    url = f"{http_server.url}/flaky.html"
+    with Fetcher(retries=2, backoff=0) as fetcher:
+        response = fetcher.get(url)
+    assert response.status_code == 200
+    assert http_server.requests == ["/flaky.html", "/flaky.html"]
+
+
+def test_fetch_errors(http_server):
+    url = f"{http_server.url}/404.html"
+    with Fetcher(retries=0) as fetcher:
+        [(_, err)] = fetcher.fetch_all([url])
+    assert isinstance(err, requests.HTTPError)
+    assert describe_error(err, url) == f"HTTP 404 Not Found ({url})"
+
+
+def test_fetch_cache(http_server, tmp_path):
+    url = f"{http_server.url}/cached.html"
+    with Fetcher(cache=DiskCache(tmp_path)) as fetcher:
+        first = fetcher.get(url)
+        second = fetcher.get(url)
+        assert second.content == first.content
+        assert second.headers["Content-Type"] == "text/html; charset=utf-8"
+        assert second.encoding == "utf-8"
+        # Once the document changes the new version is downloaded and cached.
+        http_server.etag = '"v2"'
+        third = fetcher.get(url)
+        assert third.headers["ETag"] == '"v2"'
+    assert http_server.requests == ["/cached.html"] * 3
+
+
+def test_url_closes_its_fetcher(http_server, monkeypatch):
+    closed = []
+    monkeypatch.setattr(Fetcher, "close", lambda fetcher: closed.append(fetcher))
+    response = URL().convert(f"{http_server.url}/basic.html", None, None)
+    assert response.status_code == 200
+    assert len(closed) == 1
+    # A fetcher that's passed in belongs to the caller, so is left open.
+    with Fetcher(retries=0) as fetcher:
+        URL(fetcher).convert(f"{http_server.url}/basic.html", None, None)
+        assert len(closed) == 1
+
+
+def test_disk_cache_eviction(tmp_path):
+    cache = DiskCache(tmp_path, max_size=10)
+    cache.set("a", b"123456", {"n": 1})
+    os.utime(tmp_path / f"{hashlib.sha256(b'a').hexdigest()}.data", (0, 0))
+    cache.set("b", b"123456", {"n": 2})
+    cache.evict()
+    assert cache.get("a") is None
+    assert cache.get("b") == (b"123456", {"n": 2})
+    cache.max_age = -1
+    cache.evict()
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,29 @@
+import subprocess
+import sys
+
+import pytest
+
+# Generous upper limit on the time taken to import the command-line modules,
+# so the test catches a slow dependency being imported eagerly again without
+# failing on slow machines.
+IMPORT_TIME_BUDGET = 1.0  # seconds
+
+
+@pytest.mark.parametrize("module", ["htmltab.cli", "htmltab.batch"])
+def test_import_time(module):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # Each line is "import time: <self us> | <cumulative us> | <module>", after
+    # a header line.
+    cumulative = {}
+    for line in result.stderr.splitlines()[1:]:
+        _, total, name = line.removeprefix("import time:").split("|")
+        cumulative[name.strip()] = int(total)
+    assert "requests" not in cumulative
+    assert "bs4" not in cumulative
+    assert "cssselect" not in cumulative
+    assert cumulative[module] / 1_000_000 < IMPORT_TIME_BUDGET
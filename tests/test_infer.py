@@ -0,0 +1,44 @@
+import datetime
+from decimal import Decimal
+
+from htmltab import infer_types
+
+
+def test_infer_types():
+    rows = [
+        ["Name", "Count", "Share", "Price", "Date", "Code"],
+        ["A", "1,000", "5%", "€1.50", "2024-01-31", "007"],
+        ["B", "-2", None, "-$3", "2024-02-29", "X1"],
+        ["C", "", "12.5 %", "4 £", "", ""],
+        ["D", "7", "1%", "€-2", "2024-02-30", "1"],
+    ]
+    assert list(infer_types(rows, currency_symbols=["$", "€", "£"], sample_size=3)) == [
+        ["Name", "Count", "Share", "Price", "Date", "Code"],
+        [
+            "A",
+            Decimal("1000"),
+            Decimal("5"),
+            Decimal("1.50"),
+            datetime.date(2024, 1, 31),
+            "007",
+        ],
+        ["B", Decimal("-2"), None, Decimal("-3"), datetime.date(2024, 2, 29), "X1"],
+        ["C", "", Decimal("12.5"), Decimal("4"), "", ""],
+        # Cells after the sample that don't fit their column's type are kept.
+        ["D", Decimal("7"), Decimal("1"), Decimal("-2"), "2024-02-30", "1"],
+    ]
+
+
+def test_infer_types_european_numbers():
+    rows = [["x", "y"], ["1.234,5", "1.000"], ["-0,5", "12"], ["7"]]
+    assert list(infer_types(rows, ".", ",")) == [
+        ["x", "y"],
+        [Decimal("1234.5"), Decimal("1000")],
+        [Decimal("-0.5"), Decimal("12")],
+        [Decimal("7")],
+    ]
+
+
+def test_infer_types_empty():
+    assert list(infer_types([])) == []
+    assert list(infer_types([["only", "header"]])) == [["only", "header"]]
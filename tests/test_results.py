@@ -0,0 +1,35 @@
+import io
+from pathlib import Path
+
+from htmltab.results import CapturingFile, document_digest, result_key, split_result
+
+
+def test_document_digest():
+    path = Path("tests/fixtures/basic.html")
+    content = path.read_bytes()
+    digest, source = document_digest(content)
+    assert source is content
+    assert document_digest(path) == (digest, path)
+    html_file = io.BytesIO(content)
+    assert document_digest(html_file) == (digest, html_file)
+    assert html_file.tell() == 0
+
+
+def test_result_key():
+    key = result_key("abc", {})
+    assert result_key("abc", {"select": ("1",), "null_values": []}) == key
+    assert result_key("abc", {"null_values": ["NA", "N/A", "-", "."]}) == key
+    assert result_key("abd", {}) != key
+    assert result_key("abc", {"select": ["2"]}) != key
+    assert result_key("abc", {"delimiter": ";"}) != key
+
+
+def test_capturing_file():
+    output = io.StringIO()
+    capturing = CapturingFile(output, max_size=10)
+    capturing.write("a,ä\r\n")
+    assert capturing.value == "a,ä\r\n".encode()
+    assert output.getvalue() == "a,ä\r\n"
+    capturing.write("x" * 10)
+    assert capturing.value is None
+    assert split_result(b"abcdef", {"lengths": [2, 0, 4]}) == [b"ab", b"", b"cdef"]
@@ -0,0 +1,160 @@
+import http.client
+import socket
+import threading
+
+import pytest
+
+from htmltab.serve import HTTPServer, RequestHandler, UnixServer, parse_options
+
+
+def serve(server):
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+    return thread
+
+
+@pytest.fixture
+def server():
+    """
+    Run a conversion server on a free port in a background thread.
+    """
+    server = HTTPServer(("127.0.0.1", 0), RequestHandler, workers=2, quiet=True)
+    serve(server)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def post(server, path, body):
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_port)
+    connection.request("POST", path, body)
+    response = connection.getresponse()
+    return response.status, response.read().decode("utf-8")
+
+
+@pytest.fixture
+def basic_html():
+    with open("tests/fixtures/basic.html", "rb") as fh:
+        return fh.read()
+
+
+def test_convert(server, basic_html, basic_csv):
+    status, body = post(server, "/", basic_html)
+    assert status == 200
+    assert body == basic_csv.replace("\n", "\r\n")
+
+
+def test_options(server, three_csv_table_two_keep):
+    with open("tests/fixtures/three.html", "rb") as fh:
+        html = fh.read()
+    status, body = post(server, "/?select=2&keep-numbers", html)
+    assert status == 200
+    assert body == three_csv_table_two_keep.replace("\n", "\r\n")
+    status, body = post(server, "/?select=2&delimiter=%09&limit=1", html)
+    assert status == 200
+    assert body == "Column 1\tColumn 2\r\n"
+    status, body = post(server, "/?select=2&stream&offset=1&limit=1", html)
+    assert status == 200
+    assert body == "ABC,DEF\r\n"
+
+
+def test_converted_in_worker_processes(server, basic_html, basic_csv):
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_port)
+    connection.request("POST", "/", basic_html)
+    response = connection.getresponse()
+    assert response.read().decode("utf-8") == basic_csv.replace("\n", "\r\n")
+    assert response.getheader("Content-Length") is not None
+    # Streamed documents are converted as they're received, by the thread
+    # handling the request, so they're converted without the worker processes.
+    server.processes.shutdown()
+    connection.request("POST", "/?stream", basic_html)
+    response = connection.getresponse()
+    assert response.read().decode("utf-8") == basic_csv.replace("\n", "\r\n")
+    assert response.getheader("Transfer-Encoding") == "chunked"
+    connection.request("POST", "/", basic_html)
+    assert connection.getresponse().status == 500
+
+
+def test_keep_alive(server, basic_html, basic_csv):
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_port)
+    for _ in range(3):
+        connection.request("POST", "/?limit=1", basic_html)
+        response = connection.getresponse()
+        assert response.read().decode("utf-8") == basic_csv.splitlines()[0] + "\r\n"
+    assert not response.will_close
+
+
+@pytest.mark.parametrize(
+    "path,message",
+    [
+        ("/?select=table.nothing", "value matched no elements"),
+        ("/?select=[", "'[' not an index, CSS selector, or XPath expression"),
+        ("/?colour=red", "unknown parameter 'colour'"),
+        ("/?limit=ten", "'limit' must be a whole number"),
+        ("/?columns=0", "'columns' must be at least 1"),
+        ("/?encoding=klingon", "unknown encoding 'klingon'"),
+    ],
+)
+def test_errors(server, basic_html, path, message):
+    status, body = post(server, path, basic_html)
+    assert status == 400
+    assert body == message + "\n"
+
+
+def test_worker_failure(server, basic_html):
+    server.processes.shutdown()
+    status, body = post(server, "/", basic_html)
+    assert status == 500
+    assert body == "could not convert table\n"
+
+
+def test_max_size(basic_html):
+    server = HTTPServer(("127.0.0.1", 0), RequestHandler, max_size=100, quiet=True)
+    serve(server)
+    try:
+        status, _ = post(server, "/", basic_html)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert status == 413
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets")
+def test_unix_socket(tmp_path, basic_html, basic_csv):
+    path = str(tmp_path / "htmltab.sock")
+    server = UnixServer(path, RequestHandler, quiet=True)
+    serve(server)
+    try:
+        with socket.socket(socket.AF_UNIX) as sock:
+            sock.connect(path)
+            connection = http.client.HTTPConnection("localhost")
+            connection.sock = sock
+            connection.request("POST", "/", basic_html)
+            body = connection.getresponse().read().decode("utf-8")
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert body == basic_csv.replace("\n", "\r\n")
+
+
+def test_parse_options_parquet_requires_pyarrow(monkeypatch):
+    monkeypatch.setattr("importlib.util.find_spec", lambda name: None)
+    with pytest.raises(ValueError, match="requires pyarrow"):
+        parse_options("format=parquet")
+
+
+def test_parse_options():
+    options, output_options = parse_options(
+        "select=table%23data&null-value=-&null-value=n%2Fa&infer-types&no-pad=false"
+    )
+    assert options["select"] == "table#data"
+    assert options["null_values"] == ["-", "n/a"]
+    assert options["convert_numbers"] is False
+    assert output_options["infer_types"] is True
+    assert output_options["pad"] is True
+    with pytest.raises(ValueError, match="more than once"):
+        parse_options("select=1&select=2")
+    with pytest.raises(ValueError, match="single character"):
+        parse_options("delimiter=ab")
@@ -0,0 +1,59 @@
+import io
+
+from htmltab import extract_table, stats
+from htmltab.fetch import Fetcher
+
+
+def test_hooks():
+    calls = []
+
+    def hook(stage, metrics):
+        calls.append((stage, metrics))
+
+    stats.add_hook(hook)
+    try:
+        with open("tests/fixtures/basic.html", "rb") as fh:
+            rows = list(extract_table(fh.read()))
+    finally:
+        stats.remove_hook(hook)
+    assert [stage for stage, _ in calls] == ["parse", "select", "convert"]
+    parse, select, convert = (metrics for _, metrics in calls)
+    assert parse["bytes_in"] > 0
+    assert select["elements"] == 1
+    assert convert["rows"] == len(rows)
+    assert convert["cells"] == sum(map(len, rows))
+    assert all(metrics["seconds"] >= 0 for _, metrics in calls)
+    assert not stats.enabled()
+
+
+def test_collect_stops_early():
+    """
+    Rows not requested by the caller aren't counted.
+    """
+    html = "<table>" + "<tr><td>1</td></tr>" * 10 + "</table>"
+    with stats.collect() as collector:
+        rows = extract_table(html, stream=True)
+        next(rows)
+        rows.close()
+    report = collector.report()
+    assert report["stages"]["convert"]["rows"] == 1
+    assert report["stages"]["convert"]["calls"] == 1
+    assert report["seconds"] >= report["stages"]["convert"]["seconds"]
+    assert not stats.enabled()
+
+
+def test_measure_output():
+    output = io.StringIO()
+    with stats.collect() as collector:
+        with stats.measure_output([["ä"], ["b"]], output) as (rows, out):
+            for row in rows:
+                out.write(row[0])
+    assert output.getvalue() == "äb"
+    assert collector.stages["write"]["rows"] == 2
+    assert collector.stages["write"]["bytes_out"] == 3
+
+
+def test_fetch(http_server):
+    with stats.collect() as collector, Fetcher() as fetcher:
+        response = fetcher.get(f"{http_server.url}/basic.html")
+    assert collector.stages["fetch"]["bytes_in"] == len(response.content)
@@ -0,0 +1,41 @@
+import datetime
+from decimal import Decimal
+
+from htmltab.store import MAX_CODES, RowStore
+
+
+def test_row_store_pads_rows():
+    rows = [
+        ["a", Decimal("1.50"), None],
+        ["b"],
+        [],
+        ["c", Decimal("2"), datetime.date(2024, 1, 31), "d"],
+    ]
+    store = RowStore(rows)
+    assert len(store) == 4
+    assert store.num_columns == 4
+    assert list(store) == [
+        ["a", Decimal("1.50"), None, ""],
+        ["b", "", "", ""],
+        ["", "", "", ""],
+        ["c", Decimal("2"), datetime.date(2024, 1, 31), "d"],
+    ]
+    # Decimals keep their exponent.
+    assert str(list(store)[0][1]) == "1.50"
+    assert store.column(3) == [None, None, None, "d"]
+    assert store.column(4, missing="") == ["", "", "", ""]
+
+
+def test_row_store_many_distinct_values():
+    rows = [
+        [str(i), Decimal(i) / 8, None if i % 3 else "é"] for i in range(MAX_CODES + 10)
+    ]
+    rows[5] = ["x"]
+    store = RowStore(rows)
+    assert list(store) == [row + [""] * (3 - len(row)) for row in rows]
+    assert store.column(1)[5] is None
+
+
+def test_row_store_empty_rows():
+    assert list(RowStore()) == []
+    assert list(RowStore([[], []])) == [[], []]